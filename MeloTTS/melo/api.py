@@ -1,6 +1,7 @@
 import os
 import re
 import json
+import contextlib
 import torch
 import librosa
 import soundfile
@@ -71,6 +72,16 @@ class TTS(nn.Module):
         audio_segments = np.array(audio_segments).astype(np.float32)
         return audio_segments
 
+    @staticmethod
+    def audio_tensor_concat(segment_data_list, sr, speed=1.):
+        # 与 audio_numpy_concat 相同，但各段保持在原设备上拼接
+        gap = int((sr * 0.05) / speed)
+        audio_segments = []
+        for segment_data in segment_data_list:
+            audio_segments.append(segment_data.reshape(-1))
+            audio_segments.append(segment_data.new_zeros(gap))
+        return torch.cat(audio_segments)
+
     @staticmethod
     def split_sentences_into_pieces(text, language, quiet=False):
         texts = split_sentence(text, language_str=language)
@@ -80,7 +91,11 @@ class TTS(nn.Module):
             print(" > ===========================")
         return texts
 
-    def tts_to_file(self, text, speaker_id, output_path=None, sdp_ratio=0.2, noise_scale=0.6, noise_scale_w=0.8, speed=1.0, pbar=None, format=None, position=None, quiet=False,):
+    def tts_to_file(self, text, speaker_id, output_path=None, sdp_ratio=0.2, noise_scale=0.6, noise_scale_w=0.8, speed=1.0, pbar=None, format=None, position=None, quiet=False, return_tensor=False, infer_lock=None,):
+        # return_tensor=True 且 output_path 为 None 时返回位于 self.device 上的 float32 张量，省去逐句拷回 CPU
+        return_tensor = return_tensor and output_path is None
+        # infer_lock 只包住声学模型推理，文本前端（含 BERT）可与其他线程并发，以便 BERT 批处理合并请求
+        infer_lock = infer_lock if infer_lock is not None else contextlib.nullcontext()
         language = self.language
         texts = self.split_sentences_into_pieces(text, language, quiet)
         audio_list = []
@@ -107,23 +122,28 @@ class TTS(nn.Module):
                 x_tst_lengths = torch.LongTensor([phones.size(0)]).to(device)
                 del phones
                 speakers = torch.LongTensor([speaker_id]).to(device)
-                audio = self.model.infer(
-                        x_tst,
-                        x_tst_lengths,
-                        speakers,
-                        tones,
-                        lang_ids,
-                        bert,
-                        ja_bert,
-                        sdp_ratio=sdp_ratio,
-                        noise_scale=noise_scale,
-                        noise_scale_w=noise_scale_w,
-                        length_scale=1. / speed,
-                    )[0][0, 0].data.cpu().float().numpy()
+                with infer_lock:
+                    audio = self.model.infer(
+                            x_tst,
+                            x_tst_lengths,
+                            speakers,
+                            tones,
+                            lang_ids,
+                            bert,
+                            ja_bert,
+                            sdp_ratio=sdp_ratio,
+                            noise_scale=noise_scale,
+                            noise_scale_w=noise_scale_w,
+                            length_scale=1. / speed,
+                        )[0][0, 0].data.float()
+                if not return_tensor:
+                    audio = audio.cpu().numpy()
                 del x_tst, tones, lang_ids, bert, ja_bert, x_tst_lengths, speakers
                 # 
             audio_list.append(audio)
         torch.cuda.empty_cache()
+        if return_tensor:
+            return self.audio_tensor_concat(audio_list, sr=self.hps.data.sampling_rate, speed=speed)
         audio = self.audio_numpy_concat(audio_list, sr=self.hps.data.sampling_rate, speed=speed)
 
         if output_path is None:
@@ -1,8 +1,41 @@
+import concurrent.futures
+import importlib
+import logging
+from operator import itemgetter
+
+import numpy as np
+
 from .symbols import *
 
 
+logger = logging.getLogger(__name__)
+
 _symbol_to_id = {s: i for i, s in enumerate(symbols)}
 
+# 按语言按需导入，避免在离线环境触发未使用语言的 HuggingFace 下载
+_bert_module_map = {
+    "ZH": ".chinese_bert",
+    "EN": ".english_bert",
+    "JP": ".japanese_bert",
+    "ZH_MIX_EN": ".chinese_mix",
+    "FR": ".french_bert",
+    "SP": ".spanish_bert",
+    "ES": ".spanish_bert",
+    "KR": ".korean",
+}
+
+# language -> get_bert_feature，首次使用时导入并缓存，之后只需一次 dict 查找
+_bert_feature_fns = {}
+
+# 支持批量 BERT 特征提取的语言模块（需提供 get_bert_feature_batch）
+_bert_batch_module_map = {
+    "ZH": ".chinese_bert",
+    "ZH_MIX_EN": ".chinese_mix",
+}
+
+# language -> BucketBatcher，由 enable_bert_batching 注册
+_bert_batchers = {}
+
 
 def cleaned_text_to_sequence(cleaned_text, tones, language, symbol_to_id=None):
     """Converts a string of text to a sequence of IDs corresponding to the symbols in the text.
@@ -12,30 +45,58 @@ def cleaned_text_to_sequence(cleaned_text, tones, language, symbol_to_id=None):
       List of integers corresponding to the symbols in the text
     """
     symbol_to_id_map = symbol_to_id if symbol_to_id else _symbol_to_id
-    phones = [symbol_to_id_map[symbol] for symbol in cleaned_text]
+    # itemgetter 在 C 层批量查表；单个参数时它返回标量而非元组，需单独处理
+    if len(cleaned_text) > 1:
+        phones = list(itemgetter(*cleaned_text)(symbol_to_id_map))
+    else:
+        phones = [symbol_to_id_map[symbol] for symbol in cleaned_text]
     tone_start = language_tone_start_map[language]
-    tones = [i + tone_start for i in tones]
-    lang_id = language_id_map[language]
-    lang_ids = [lang_id for i in phones]
+    # ZH / ZH_MIX_EN 的 tone_start 为 0，无需偏移；其余语言一次 NumPy 加法，
+    # 下游 intersperse 与 LongTensor 需要 list，末尾统一 tolist()
+    if tone_start:
+        # 先按 int32 建数组：空列表时 np.add 会得到 float64 并在转换 int32 时报错
+        tones = (np.asarray(tones, dtype=np.int32) + tone_start).tolist()
+    else:
+        tones = list(tones)
+    lang_ids = [language_id_map[language]] * len(phones)
     return phones, tones, lang_ids
 
 
+def enable_bert_batching(language, device, **batcher_kwargs):
+    """为指定语言启用分桶批处理，之后并发的 get_bert 调用会合并为批量前向。
+
+    语言不支持批量提取时返回 False。
+    """
+    from functools import partial
+    from .bert_batcher import BucketBatcher
+
+    if language not in _bert_batch_module_map:
+        return False
+    if language not in _bert_batchers:
+        module = importlib.import_module(_bert_batch_module_map[language], package=__name__)
+        _bert_batchers[language] = BucketBatcher(
+            partial(module.get_bert_feature_batch, device=device), **batcher_kwargs
+        )
+    return True
+
+
+def _get_bert_feature_fn(language):
+    fn = _bert_feature_fns.get(language)
+    if fn is None:
+        if language not in _bert_module_map:
+            raise ValueError(f"Unsupported language for BERT: {language}. Supported: {list(_bert_module_map.keys())}")
+        module = importlib.import_module(_bert_module_map[language], package=__name__)
+        fn = _bert_feature_fns.setdefault(language, module.get_bert_feature)
+    return fn
+
+
 def get_bert(norm_text, word2ph, language, device):
     """根据输入语言仅加载对应语言的 BERT 模块，避免离线环境下加载未使用的模型。"""
-    import importlib
-    # 按语言按需导入，避免在离线环境触发未使用语言的 HuggingFace 下载
-    lang_module_map = {
-        "ZH": ".chinese_bert",
-        "EN": ".english_bert",
-        "JP": ".japanese_bert",
-        "ZH_MIX_EN": ".chinese_mix",
-        "FR": ".french_bert",
-        "SP": ".spanish_bert",
-        "ES": ".spanish_bert",
-        "KR": ".korean",
-    }
-    if language not in lang_module_map:
-        raise ValueError(f"Unsupported language for BERT: {language}. Supported: {list(lang_module_map.keys())}")
-    module = importlib.import_module(lang_module_map[language], package=__name__)
-    get_bert_feature = getattr(module, "get_bert_feature")
-    return get_bert_feature(norm_text, word2ph, device)
+    batcher = _bert_batchers.get(language)
+    if batcher is not None and batcher.alive:
+        try:
+            return batcher.submit(norm_text, word2ph).result(timeout=batcher.result_timeout)
+        except concurrent.futures.TimeoutError:
+            # 批处理线程卡住时不让请求无限等待，回退为单句直接推理
+            logger.warning("BERT 批处理等待超过 %.1f 秒，回退为直接推理", batcher.result_timeout)
+    return _get_bert_feature_fn(language)(norm_text, word2ph, device)
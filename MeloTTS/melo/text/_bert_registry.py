@@ -0,0 +1,23 @@
+"""进程内共享的 BERT 模型注册表。
+
+各语言的 *_bert.py 通过 get_model 取得 (model, tokenizer)，同一模型在进程内只加载一次，
+首次加载由锁串行化，避免多个线程（如 BucketBatcher 工作线程与请求线程）重复加载。
+"""
+import threading
+
+
+_models = {}
+_lock = threading.RLock()
+
+
+def get_model(load_key, loader_fn, device=None):
+    """返回 load_key 在 device 上对应的加载结果，未加载时调用 loader_fn()。"""
+    key = (load_key, str(device))
+    entry = _models.get(key)
+    if entry is None:
+        with _lock:
+            entry = _models.get(key)
+            if entry is None:
+                entry = _models[key] = loader_fn()
+    return entry
+
@@ -0,0 +1,104 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future
+
+
+logger = logging.getLogger(__name__)
+
+
+# 按 token 数分桶（闭区间），超过最后一个桶上限的句子单独归入溢出桶
+DEFAULT_BUCKETS = ((1, 16), (17, 32), (33, 64), (65, 128))
+
+
+class BucketBatcher:
+    """按长度分桶的 BERT 批处理器。
+
+    并发提交的句子在 max_wait_ms 内被收集，按 token 数（即 len(word2ph)）
+    归入长度桶，每个桶以不超过 max_batch_size 的批次调用一次 batch_fn，
+    再把结果分发回各自的 Future。同桶句子长度接近，padding 浪费较小。
+
+    batch_fn(texts, word2phs) 需返回与输入一一对应的特征列表，
+    例如 chinese_bert.get_bert_feature_batch；数量不符时该批全部以异常结束。
+
+    result_timeout 为调用方等待结果的建议上限（秒），超时后应回退为直接推理，
+    见 melo.text.get_bert。
+    """
+
+    def __init__(self, batch_fn, buckets=DEFAULT_BUCKETS, max_batch_size=32, max_wait_ms=10, result_timeout=30.0):
+        self.batch_fn = batch_fn
+        self.buckets = buckets
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.result_timeout = result_timeout
+        self._pending = []
+        self._cond = threading.Condition()
+        self._worker = threading.Thread(target=self._run, name="bert-bucket-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, text, word2ph):
+        future = Future()
+        with self._cond:
+            self._pending.append((text, word2ph, future))
+            self._cond.notify()
+        return future
+
+    def _bucket_index(self, length):
+        for idx, (_, upper) in enumerate(self.buckets):
+            if length <= upper:
+                return idx
+        return len(self.buckets)
+
+    @property
+    def alive(self) -> bool:
+        return self._worker.is_alive()
+
+    def _run(self):
+        while True:
+            items = []
+            try:
+                with self._cond:
+                    while not self._pending:
+                        self._cond.wait()
+                    # 缓冲区已满一批时立即执行，否则最多等待 max_wait
+                    deadline = time.monotonic() + self.max_wait
+                    while len(self._pending) < self.max_batch_size:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    items, self._pending = self._pending, []
+                self._dispatch(items)
+            except Exception as e:
+                # 工作线程不能退出，否则之后提交的 Future 永远不会完成
+                logger.exception("BERT 批处理线程异常")
+                self._fail(items, e)
+
+    @staticmethod
+    def _fail(items, exc):
+        for _, _, future in items:
+            if not future.done():
+                future.set_exception(exc)
+
+    def _dispatch(self, items):
+        buckets = {}
+        for item in items:
+            buckets.setdefault(self._bucket_index(len(item[1])), []).append(item)
+
+        for bucket_items in buckets.values():
+            for start in range(0, len(bucket_items), self.max_batch_size):
+                batch = bucket_items[start:start + self.max_batch_size]
+                try:
+                    results = self.batch_fn(
+                        [text for text, _, _ in batch],
+                        [word2ph for _, word2ph, _ in batch],
+                    )
+                except Exception as e:
+                    self._fail(batch, e)
+                    continue
+                if results is None or len(results) != len(batch):
+                    got = "None" if results is None else len(results)
+                    self._fail(batch, RuntimeError(f"batch_fn 返回 {got} 个结果，期望 {len(batch)} 个"))
+                    continue
+                for (_, _, future), result in zip(batch, results):
+                    future.set_result(result)
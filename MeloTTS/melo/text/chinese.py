@@ -51,23 +51,44 @@ rep_map = {
 
 tone_modifier = ToneSandhi()
 
+# 以下正则与映射表在每次调用 / 每个字上都会用到，在导入时一次性构建
+_rep_pattern = re.compile("|".join(re.escape(p) for p in rep_map.keys()))
+_non_zh_pattern = re.compile(r"[^\u4e00-\u9fa5" + "".join(punctuation) + r"]+")
+_sentence_split_pattern = re.compile(r"(?<=[{0}])\s*".format("".join(punctuation)))
+
+# 多音节
+v_rep_map = {
+    "uei": "ui",
+    "iou": "iu",
+    "uen": "un",
+}
+# 单音节
+pinyin_rep_map = {
+    "ing": "ying",
+    "i": "yi",
+    "in": "yin",
+    "u": "wu",
+}
+single_rep_map = {
+    "v": "yu",
+    "e": "e",
+    "i": "y",
+    "u": "w",
+}
+
 
 def replace_punctuation(text):
     text = text.replace("嗯", "恩").replace("呣", "母")
-    pattern = re.compile("|".join(re.escape(p) for p in rep_map.keys()))
 
-    replaced_text = pattern.sub(lambda x: rep_map[x.group()], text)
+    replaced_text = _rep_pattern.sub(lambda x: rep_map[x.group()], text)
 
-    replaced_text = re.sub(
-        r"[^\u4e00-\u9fa5" + "".join(punctuation) + r"]+", "", replaced_text
-    )
+    replaced_text = _non_zh_pattern.sub("", replaced_text)
 
     return replaced_text
 
 
 def g2p(text):
-    pattern = r"(?<=[{0}])\s*".format("".join(punctuation))
-    sentences = [i for i in re.split(pattern, text) if i.strip() != ""]
+    sentences = [i for i in _sentence_split_pattern.split(text) if i.strip() != ""]
     phones, tones, word2ph = _g2p(sentences)
     assert sum(word2ph) == len(phones)
     assert len(word2ph) == len(text)  # Sometimes it will crash,you can add a try-catch.
@@ -132,34 +153,16 @@ def _g2p(segments):
 
                 if c:
                     # 多音节
-                    v_rep_map = {
-                        "uei": "ui",
-                        "iou": "iu",
-                        "uen": "un",
-                    }
-                    if v_without_tone in v_rep_map.keys():
+                    if v_without_tone in v_rep_map:
                         pinyin = c + v_rep_map[v_without_tone]
                 else:
                     # 单音节
-                    pinyin_rep_map = {
-                        "ing": "ying",
-                        "i": "yi",
-                        "in": "yin",
-                        "u": "wu",
-                    }
-                    if pinyin in pinyin_rep_map.keys():
+                    if pinyin in pinyin_rep_map:
                         pinyin = pinyin_rep_map[pinyin]
-                    else:
-                        single_rep_map = {
-                            "v": "yu",
-                            "e": "e",
-                            "i": "y",
-                            "u": "w",
-                        }
-                        if pinyin[0] in single_rep_map.keys():
-                            pinyin = single_rep_map[pinyin[0]] + pinyin[1:]
-
-                assert pinyin in pinyin_to_symbol_map.keys(), (pinyin, seg, raw_pinyin)
+                    elif pinyin[0] in single_rep_map:
+                        pinyin = single_rep_map[pinyin[0]] + pinyin[1:]
+
+                assert pinyin in pinyin_to_symbol_map, (pinyin, seg, raw_pinyin)
                 phone = pinyin_to_symbol_map[pinyin].split(" ")
                 word2ph.append(len(phone))
 
@@ -1,37 +1,272 @@
 import os
+import contextlib
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
 import torch
+import torch.nn as nn
 import sys
 from transformers import AutoTokenizer, AutoModelForMaskedLM
+from transformers.modeling_outputs import BaseModelOutput
+from transformers.utils import is_accelerate_available
+
+from . import _bert_registry
 
 
 # model_id = 'hfl/chinese-roberta-wwm-ext-large'
 local_path = "./bert/chinese-roberta-wwm-ext-large"
 
+TEACHER_MODEL_ID = 'hfl/chinese-roberta-wwm-ext-large'
+# ZH 声学模型期望的 BERT 特征维度
+FEATURE_DIM = 1024
+
+# 未显式指定 model_id 时使用的模型，可通过 set_default_model 切换为蒸馏后的
+# 小模型（如 uer/chinese_roberta_L-4_H-256，或本地目录）。
+# 仅作用于纯中文 ZH 路径（chinese.get_bert_feature）：MeloTTS 的 ZH 模型实际以 ZH_MIX_EN 运行，
+# chinese_mix 显式传入 bert-base-multilingual-uncased（768 维，word2ph 依赖其分词器），不受影响
+default_model_id = TEACHER_MODEL_ID
+
+
+logger = logging.getLogger(__name__)
+
+projections = {}
+
+# 词级特征 LRU 缓存：key = blake2b(text) + 模型标识，value 为 CPU 上的 [L, H] 张量。
+# 只缓存词级输出，phone 级展开仍按调用方的 word2ph 进行
+BERT_CACHE_SIZE = 512
+# 过短的文本前向本身很便宜，不值得占用缓存
+BERT_CACHE_MIN_TEXT_LEN = 4
+_bert_cache = OrderedDict()
+_bert_cache_lock = threading.Lock()
+
+# MELO_BERT_CUDA_GRAPHS=1 时，CUDA 上按输入形状 (batch, seq_len) 捕获 CUDA Graph 并重放，
+# 省去每次前向数百个 kernel 的 launch 开销。NestedTensor 形状不固定，因此与 BetterTransformer 互斥
+USE_CUDA_GRAPHS = os.environ.get("MELO_BERT_CUDA_GRAPHS") == "1"
+# 启用 CUDA Graph 时 seq_len 对齐到该倍数，减少需要捕获的形状数
+CUDA_GRAPH_PAD_MULTIPLE = 16
+_graph_runners = {}
+
+# MELO_BERT_ONNX=1 时首次加载把截断后的 BERT 导出为 ONNX（已存在则直接复用），
+# 改由 onnxruntime 推理；onnxruntime 缺失或导出失败时保持 PyTorch 模型
+USE_ONNX = os.environ.get("MELO_BERT_ONNX") == "1"
+
+_cuda_streams = {}
+_cuda_streams_lock = threading.Lock()
+
 
-tokenizers = {}
-models = {}
+def set_default_model(model_id):
+    """切换默认 BERT（仅库调用，仅影响 ZH 路径）。hidden size 不足 FEATURE_DIM 时需先用 fit_projection 生成投影层。"""
+    global default_model_id
+    default_model_id = model_id
 
-def get_bert_feature(text, word2ph, device=None, model_id='hfl/chinese-roberta-wwm-ext-large', model_path=None):
+
+def _accelerate(model, device):
+    """CPU 上尝试 IPEX fast_bert (bf16)，GPU 上尝试 BetterTransformer；依赖缺失时保持原模型。
+
+    CPU 上设置 MELO_BERT_INT8=1 时改用 int8 动态量化（Linear 层）。
+    """
+    if device in (None, "cpu"):
+        if os.environ.get("MELO_BERT_INT8") == "1":
+            return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+        try:
+            import intel_extension_for_pytorch as ipex
+            return ipex.fast_bert(model, dtype=torch.bfloat16)
+        except Exception as e:
+            logger.info("未启用 ipex.fast_bert，使用原生 PyTorch: %s", e)
+    elif str(device).startswith("cuda") and not USE_CUDA_GRAPHS:
+        try:
+            from optimum.bettertransformer import BetterTransformer
+            return BetterTransformer.transform(model)
+        except Exception as e:
+            logger.info("未启用 BetterTransformer，使用原生 PyTorch: %s", e)
+    return model
+
+
+def _use_local(model_path):
     # 离线/ Docker：优先从本地路径加载，避免 HuggingFace 联网
-    use_local = (
+    return (
         model_path is not None
         and os.path.isdir(model_path)
         and os.path.isfile(os.path.join(model_path, "config.json"))
     )
+
+
+def _artifact_dir(model_id, model_path):
+    # 投影层、ONNX 等派生文件与模型权重放在一起；Hub 模型则放到 ./bert/<name>/ 下
+    if _use_local(model_path):
+        return model_path
+    return os.path.join("./bert", model_id.split("/")[-1])
+
+
+def _projection_path(model_id, model_path):
+    return os.path.join(_artifact_dir(model_id, model_path), "projection.pt")
+
+
+class _OrtModel:
+    """onnxruntime 会话的轻量包装，调用方式与截断后的 HF 模型一致。"""
+
+    def __init__(self, session, config, device):
+        self.session = session
+        self.config = config
+        self.device = device
+        self._input_names = [i.name for i in session.get_inputs()]
+
+    def __call__(self, **inputs):
+        feed = {name: inputs[name].cpu().numpy() for name in self._input_names}
+        hidden = self.session.run(None, feed)[0]
+        return BaseModelOutput(last_hidden_state=torch.from_numpy(hidden).to(self.device))
+
+
+class _ExportWrapper(nn.Module):
+    def __init__(self, model, input_names):
+        super().__init__()
+        self.model = model
+        self.input_names = input_names
+
+    def forward(self, *args):
+        return self.model(**dict(zip(self.input_names, args))).last_hidden_state
+
+
+def _load_onnx(model, tokenizer, device, onnx_path):
+    try:
+        import onnxruntime as ort
+    except ImportError as e:
+        logger.info("未启用 onnxruntime，使用原生 PyTorch: %s", e)
+        return None
+
+    try:
+        if not os.path.isfile(onnx_path):
+            dummy = tokenizer(["你好"], return_tensors="pt")
+            input_names = list(dummy.keys())
+            params = next(model.parameters())
+            os.makedirs(os.path.dirname(onnx_path) or ".", exist_ok=True)
+            # 先写临时文件再改名，避免中途失败留下残缺的模型
+            tmp_path = onnx_path + ".tmp"
+            torch.onnx.export(
+                _ExportWrapper(model, input_names),
+                tuple(dummy[name].to(params.device) for name in input_names),
+                tmp_path,
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes={
+                    name: {0: "B", 1: "L"} for name in input_names + ["last_hidden_state"]
+                },
+                opset_version=14,
+            )
+            os.replace(tmp_path, onnx_path)
+            logger.info("已导出 BERT ONNX 模型: %s", onnx_path)
+
+        preferred = ["OpenVINOExecutionProvider", "CPUExecutionProvider"]
+        if str(device).startswith("cuda"):
+            preferred.insert(0, "CUDAExecutionProvider")
+        available = ort.get_available_providers()
+        providers = [p for p in preferred if p in available]
+        session = ort.InferenceSession(onnx_path, providers=providers)
+    except Exception as e:
+        logger.info("未启用 onnxruntime，使用原生 PyTorch: %s", e)
+        return None
+    return _OrtModel(session, model.config, device)
+
+
+def _load_model(device, model_id, model_path):
+    use_local = _use_local(model_path)
     load_key = model_path if use_local else model_id
 
-    if load_key not in models:
+    # 目录中存在 model.safetensors 时 transformers 优先以 mmap 方式读取（见 tools/convert_bert_to_safetensors.py）；
+    # low_cpu_mem_usage 跳过随机初始化直接落权重，需要 accelerate
+    load_kwargs = {
+        "low_cpu_mem_usage": is_accelerate_available(),
+        "torch_dtype": torch.float16 if device is not None and str(device) != "cpu" else torch.float32,
+    }
+
+    def loader():
         if use_local:
-            models[load_key] = AutoModelForMaskedLM.from_pretrained(
-                model_path, local_files_only=True
+            model = AutoModelForMaskedLM.from_pretrained(
+                model_path, local_files_only=True, **load_kwargs
             ).to(device)
-            tokenizers[load_key] = AutoTokenizer.from_pretrained(model_path, local_files_only=True)
+            tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=True)
         else:
-            models[load_key] = AutoModelForMaskedLM.from_pretrained(model_id).to(device)
-            tokenizers[load_key] = AutoTokenizer.from_pretrained(model_id)
-    model = models[load_key]
-    tokenizer = tokenizers[load_key]
+            model = AutoModelForMaskedLM.from_pretrained(model_id, **load_kwargs).to(device)
+            tokenizer = AutoTokenizer.from_pretrained(model_id)
+        # 只用到倒数第三层输出：丢弃 MLM head、pooler 与最后两层 encoder，
+        # 截断后 last_hidden_state 即原 hidden_states[-3]
+        model = model.base_model
+        model.encoder.layer = nn.ModuleList(model.encoder.layer[:-2])
+        model.config.num_hidden_layers = len(model.encoder.layer)
+        model.pooler = None
+        model = model.eval()
+        if USE_ONNX:
+            fp16 = load_kwargs["torch_dtype"] == torch.float16
+            onnx_path = os.path.join(
+                _artifact_dir(model_id, model_path), "model.fp16.onnx" if fp16 else "model.onnx"
+            )
+            ort_model = _load_onnx(model, tokenizer, device, onnx_path)
+            if ort_model is not None:
+                return ort_model, tokenizer
+        return _accelerate(model, device), tokenizer
+
+    # 截断后的模型与完整 MLM 模型不同，注册表中单独标记
+    return _bert_registry.get_model((load_key, "hidden_states[-3]"), loader, device)
+
+
+def _load_projection(device, model_id, model_path, hidden_size):
+    key = model_path if _use_local(model_path) else model_id
+    if key not in projections:
+        if hidden_size == FEATURE_DIM:
+            projections[key] = None
+        else:
+            path = _projection_path(model_id, model_path)
+            if not os.path.isfile(path):
+                raise FileNotFoundError(
+                    f"BERT {model_id} hidden size 为 {hidden_size}，缺少到 {FEATURE_DIM} 维的投影层: {path}，"
+                    "请先运行 fit_projection"
+                )
+            proj = nn.Linear(hidden_size, FEATURE_DIM)
+            proj.load_state_dict(torch.load(path, map_location="cpu"))
+            projections[key] = proj.to(device).eval()
+    return projections[key]
+
+
+def _resolve_model(device, model_id, model_path):
+    """加载 BERT；未指定 model_id 时使用默认模型，并在需要时附带到 FEATURE_DIM 的投影层。
+
+    返回 (model, tokenizer, projection, cache_id)，cache_id 用于区分特征缓存。
+    """
+    if model_id is not None:
+        model, tokenizer = _load_model(device, model_id, model_path)
+        cache_id = model_path if _use_local(model_path) else model_id
+        return model, tokenizer, None, cache_id
+    model_id = model_path = default_model_id
+    model, tokenizer = _load_model(device, model_id, model_path)
+    projection = _load_projection(device, model_id, model_path, model.config.hidden_size)
+    return model, tokenizer, projection, f"default:{model_id}"
+
+
+def _cache_key(text, cache_id):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest() + cache_id.encode("utf-8")
+
+
+def _cache_get(key):
+    with _bert_cache_lock:
+        res = _bert_cache.get(key)
+        if res is not None:
+            _bert_cache.move_to_end(key)
+        return res
 
+
+def _cache_put(key, text, res):
+    if len(text) < BERT_CACHE_MIN_TEXT_LEN:
+        return
+    with _bert_cache_lock:
+        _bert_cache[key] = res
+        _bert_cache.move_to_end(key)
+        while len(_bert_cache) > BERT_CACHE_SIZE:
+            _bert_cache.popitem(last=False)
+
+
+def _resolve_device(device):
     if (
         sys.platform == "darwin"
         and torch.backends.mps.is_available()
@@ -40,23 +275,210 @@ def get_bert_feature(text, word2ph, device=None, model_id='hfl/chinese-roberta-w
         device = "mps"
     if not device:
         device = "cuda"
+    return device
 
-    with torch.no_grad():
-        inputs = tokenizer(text, return_tensors="pt")
-        for i in inputs:
-            inputs[i] = inputs[i].to(device)
-        res = model(**inputs, output_hidden_states=True)
-        res = torch.cat(res["hidden_states"][-3:-2], -1)[0].cpu()
+
+def _get_cuda_streams(device):
+    """每个 CUDA 设备一对进程级的 (copy_stream, compute_stream)。"""
+    key = str(device)
+    streams = _cuda_streams.get(key)
+    if streams is None:
+        with _cuda_streams_lock:
+            streams = _cuda_streams.get(key)
+            if streams is None:
+                streams = _cuda_streams[key] = (
+                    torch.cuda.Stream(device=device),
+                    torch.cuda.Stream(device=device),
+                )
+    return streams
+
+
+def _compute_stream(model, device):
+    # CUDA 上 BERT 前向放到专用 compute stream，与其他线程的 H2D 拷贝、分词重叠
+    if str(device).startswith("cuda") and not isinstance(model, _OrtModel):
+        return torch.cuda.stream(_get_cuda_streams(device)[1])
+    return contextlib.nullcontext()
+
+
+def _move_inputs(inputs, device):
+    # CUDA 上把 input_ids / attention_mask / token_type_ids（同形状的 int64）打包进一块
+    # pinned 缓冲区，在 copy stream 上一次异步 H2D 拷贝，再让当前 stream 等待；
+    # 其余设备整体搬运 BatchEncoding
+    if str(device).startswith("cuda"):
+        copy_stream = _get_cuda_streams(device)[0]
+        names = list(inputs.keys())
+        packed = torch.stack([inputs[k] for k in names]).pin_memory()
+        with torch.cuda.stream(copy_stream):
+            packed = packed.to(device, non_blocking=True)
+        current = torch.cuda.current_stream(device)
+        current.wait_stream(copy_stream)
+        # 显存在 copy stream 上分配，告知分配器它仍被当前 stream 使用
+        packed.record_stream(current)
+        return dict(zip(names, packed.unbind(0)))
+    return inputs.to(device)
+
+
+class _CudaGraphRunner:
+    """按输入形状缓存 CUDA Graph：同一形状第二次出现时捕获，之后直接 replay。"""
+
+    def __init__(self, model, max_graphs=16):
+        self.model = model
+        self.max_graphs = max_graphs
+        self._graphs = {}
+        self._seen = {}
+        # 静态输入/输出缓冲区在 replay 期间被独占
+        self._lock = threading.Lock()
+
+    def __call__(self, inputs):
+        shape = tuple(inputs["input_ids"].shape)
+        with self._lock:
+            entry = self._graphs.get(shape)
+            if entry is None:
+                self._seen[shape] = self._seen.get(shape, 0) + 1
+                if self._seen[shape] != 2 or len(self._graphs) >= self.max_graphs:
+                    return self.model(**inputs).last_hidden_state
+                try:
+                    entry = self._graphs[shape] = self._capture(inputs)
+                except Exception as e:
+                    # 捕获失败的形状之后一直走 eager（_seen 已越过 2，不会重试）
+                    logger.info("CUDA Graph 捕获失败，形状 %s 回退 eager: %s", shape, e)
+                    return self.model(**inputs).last_hidden_state
+            static_inputs, static_out, graph = entry
+            for k, v in inputs.items():
+                static_inputs[k].copy_(v)
+            graph.replay()
+            return static_out.clone()
+
+    def _capture(self, inputs):
+        static_inputs = {k: v.clone() for k, v in inputs.items()}
+        # 在旁路 stream 上预热，避免把 cuBLAS 等的惰性初始化录进图里
+        stream = torch.cuda.Stream()
+        stream.wait_stream(torch.cuda.current_stream())
+        with torch.cuda.stream(stream):
+            for _ in range(3):
+                self.model(**static_inputs)
+        torch.cuda.current_stream().wait_stream(stream)
+
+        graph = torch.cuda.CUDAGraph()
+        with torch.cuda.graph(graph):
+            static_out = self.model(**static_inputs).last_hidden_state
+        return static_inputs, static_out, graph
+
+
+def _run_model(model, inputs, device):
+    if USE_CUDA_GRAPHS and str(device).startswith("cuda") and not isinstance(model, _OrtModel):
+        runner = _graph_runners.get(id(model))
+        if runner is None:
+            runner = _graph_runners.setdefault(id(model), _CudaGraphRunner(model))
+        return runner(inputs)
+    return model(**inputs).last_hidden_state
+
+
+def _encode(model, tokenizer, projection, texts, device):
+    """对 texts 做一次前向，返回每句去掉 padding 后的词级特征（CPU 上的 [L, H] 张量）。"""
+    tokenize_kwargs = {}
+    if USE_CUDA_GRAPHS and str(device).startswith("cuda"):
+        tokenize_kwargs["pad_to_multiple_of"] = CUDA_GRAPH_PAD_MULTIPLE
+    encoded = tokenizer(list(texts), padding=True, return_tensors="pt", **tokenize_kwargs)
+    # 每句有效 token 数（tokenizer 右侧 padding），用于剔除 pad 位置
+    lengths = encoded["attention_mask"].sum(-1).tolist()
+
+    with torch.inference_mode(), _compute_stream(model, device):
+        # onnxruntime 直接读取 CPU 上的 numpy 输入，无需搬到设备
+        inputs = encoded if isinstance(model, _OrtModel) else _move_inputs(encoded, device)
+        hidden = _run_model(model, inputs, device).float()
+        if projection is not None:
+            hidden = projection(hidden)
+        hidden = hidden.cpu()
+
+    if len(texts) == 1 and lengths[0] == hidden.shape[1]:
+        return [hidden[0]]
+    # clone 以免缓存的切片视图拖住整批张量
+    return [hidden[b, :lengths[b]].clone() for b in range(len(texts))]
+
+
+def _word_to_phone_level(res, word2phone):
+    w2ph = torch.as_tensor(word2phone, dtype=torch.long, device=res.device)
+    phone_level_feature = torch.repeat_interleave(res, w2ph, dim=0)
+    return phone_level_feature.T
+
+
+def get_bert_feature(text, word2ph, device=None, model_id=None, model_path=None):
+    model, tokenizer, projection, cache_id = _resolve_model(device, model_id, model_path)
+    key = _cache_key(text, cache_id)
+    res = _cache_get(key)
+    if res is None:
+        res = _encode(model, tokenizer, projection, [text], _resolve_device(device))[0]
+        _cache_put(key, text, res)
     # import pdb; pdb.set_trace()
     # assert len(word2ph) == len(text) + 2
-    word2phone = word2ph
-    phone_level_feature = []
-    for i in range(len(word2phone)):
-        repeat_feature = res[i].repeat(word2phone[i], 1)
-        phone_level_feature.append(repeat_feature)
+    return _word_to_phone_level(res, word2ph)
 
-    phone_level_feature = torch.cat(phone_level_feature, dim=0)
-    return phone_level_feature.T
+
+def get_bert_feature_batch(texts, word2phs, device=None, model_id=None, model_path=None):
+    """多句共享一次 BERT 前向，返回与 texts 一一对应的 phone 级特征列表。
+
+    padding 位置由 attention_mask 屏蔽，输出按每句的有效 token 数切回，
+    因此结果与逐句调用 get_bert_feature 一致。
+    """
+    if len(texts) == 1:
+        return [get_bert_feature(texts[0], word2phs[0], device=device, model_id=model_id, model_path=model_path)]
+
+    model, tokenizer, projection, cache_id = _resolve_model(device, model_id, model_path)
+    keys = [_cache_key(text, cache_id) for text in texts]
+    word_level = [_cache_get(key) for key in keys]
+    misses = [b for b, res in enumerate(word_level) if res is None]
+
+    if misses:
+        encoded = _encode(
+            model, tokenizer, projection, [texts[b] for b in misses], _resolve_device(device)
+        )
+        for b, res in zip(misses, encoded):
+            word_level[b] = res
+            _cache_put(keys[b], texts[b], res)
+
+    return [
+        _word_to_phone_level(res, word2ph)
+        for res, word2ph in zip(word_level, word2phs)
+    ]
+
+
+def fit_projection(texts, student_model_id, student_model_path=None, device=None,
+                   teacher_model_id=TEACHER_MODEL_ID, teacher_model_path=None):
+    """用少量语料一次性回归学生模型到教师模型倒数第三层输出的线性投影，并保存到学生模型旁。
+
+    学生与教师需使用相同的中文字级词表；token 数对不上的句子会被跳过。
+    """
+    student, student_tokenizer = _load_model(device, student_model_id, student_model_path)
+    teacher, teacher_tokenizer = _load_model(device, teacher_model_id, teacher_model_path)
+    device = _resolve_device(device)
+
+    xs, ys = [], []
+    with torch.inference_mode():
+        for text in texts:
+            s_inputs = _move_inputs(student_tokenizer(text, return_tensors="pt"), device)
+            t_inputs = _move_inputs(teacher_tokenizer(text, return_tensors="pt"), device)
+            if s_inputs["input_ids"].shape != t_inputs["input_ids"].shape:
+                logger.warning("学生/教师分词长度不一致，跳过: %s", text)
+                continue
+            xs.append(student(**s_inputs).last_hidden_state[0].float().cpu())
+            ys.append(teacher(**t_inputs).last_hidden_state[0].float().cpu())
+    if not xs:
+        raise ValueError("没有可用于回归的句子")
+
+    x = torch.cat(xs, dim=0)
+    x = torch.cat([x, torch.ones(x.shape[0], 1)], dim=1)
+    solution = torch.linalg.lstsq(x, torch.cat(ys, dim=0)).solution
+
+    proj = nn.Linear(x.shape[1] - 1, FEATURE_DIM)
+    with torch.no_grad():
+        proj.weight.copy_(solution[:-1].T)
+        proj.bias.copy_(solution[-1])
+    path = _projection_path(student_model_id, student_model_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    torch.save(proj.state_dict(), path)
+    projections.pop(student_model_path if _use_local(student_model_path) else student_model_id, None)
+    return path
 
 
 if __name__ == "__main__":
@@ -108,13 +530,8 @@ if __name__ == "__main__":
     total_frames = sum(word2phone)
     print(word_level_feature.shape)
     print(word2phone)
-    phone_level_feature = []
-    for i in range(len(word2phone)):
-        print(word_level_feature[i].shape)
-
-        # 对每个词重复word2phone[i]次
-        repeat_feature = word_level_feature[i].repeat(word2phone[i], 1)
-        phone_level_feature.append(repeat_feature)
-
-    phone_level_feature = torch.cat(phone_level_feature, dim=0)
+    # 对每个词重复word2phone[i]次
+    phone_level_feature = torch.repeat_interleave(
+        word_level_feature, torch.as_tensor(word2phone, dtype=torch.long), dim=0
+    )
     print(phone_level_feature.shape)  # torch.Size([36, 1024])
@@ -56,19 +56,24 @@ rep_map = {
 tone_modifier = ToneSandhi()
 
 
+# 每次调用都会用到的正则，在导入时一次性编译
+_rep_pattern = re.compile("|".join(re.escape(p) for p in rep_map.keys()))
+_non_zh_en_pattern = re.compile(r"[^\u4e00-\u9fa5_a-zA-Z\s" + "".join(punctuation) + r"]+")
+_whitespace_pattern = re.compile(r"[\s]+")
+_sentence_split_pattern = re.compile(r"(?<=[{0}])\s*".format("".join(punctuation)))
+
+
 def replace_punctuation(text):
     text = text.replace("嗯", "恩").replace("呣", "母")
-    pattern = re.compile("|".join(re.escape(p) for p in rep_map.keys()))
-    replaced_text = pattern.sub(lambda x: rep_map[x.group()], text)
-    replaced_text = re.sub(r"[^\u4e00-\u9fa5_a-zA-Z\s" + "".join(punctuation) + r"]+", "", replaced_text)
-    replaced_text = re.sub(r"[\s]+", " ", replaced_text)
+    replaced_text = _rep_pattern.sub(lambda x: rep_map[x.group()], text)
+    replaced_text = _non_zh_en_pattern.sub("", replaced_text)
+    replaced_text = _whitespace_pattern.sub(" ", replaced_text)
 
     return replaced_text
 
 
 def g2p(text, impl='v2'):
-    pattern = r"(?<=[{0}])\s*".format("".join(punctuation))
-    sentences = [i for i in re.split(pattern, text) if i.strip() != ""]
+    sentences = [i for i in _sentence_split_pattern.split(text) if i.strip() != ""]
     if impl == 'v1':
         _func = _g2p
     elif impl == 'v2':
@@ -205,6 +210,16 @@ def get_bert_feature(text, word2ph, device):
         device=device,
     )
 
+
+def get_bert_feature_batch(texts, word2phs, device):
+    from . import chinese_bert
+    return chinese_bert.get_bert_feature_batch(
+        texts, word2phs,
+        model_id='bert-base-multilingual-uncased',
+        model_path=model_id,
+        device=device,
+    )
+
 from .chinese import _g2p as _chinese_g2p
 def _g2p_v2(segments):
     spliter = '#$&^!@'
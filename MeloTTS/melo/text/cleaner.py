@@ -1,5 +1,4 @@
 from . import cleaned_text_to_sequence
-import copy
 
 # 语言模块缓存，避免重复导入
 _language_module_cache = {}
@@ -7,8 +6,9 @@ _language_module_cache = {}
 
 def _get_language_module(language):
     """动态导入语言模块，只在需要时加载"""
-    if language in _language_module_cache:
-        return _language_module_cache[language]
+    module = _language_module_cache.get(language)
+    if module is not None:
+        return module
     
     # 动态导入对应的语言模块
     if language == "ZH":
@@ -52,9 +52,9 @@ def clean_text_bert(text, language, device=None):
     norm_text = language_module.text_normalize(text)
     phones, tones, word2ph = language_module.g2p(norm_text)
     
-    word2ph_bak = copy.deepcopy(word2ph)
-    for i in range(len(word2ph)):
-        word2ph[i] = word2ph[i] * 2
+    # 构造新列表而非原地修改，原 word2ph 无需拷贝即可作为返回值
+    word2ph_bak = word2ph
+    word2ph = [n * 2 for n in word2ph]
     word2ph[0] += 1
     bert = language_module.get_bert_feature(norm_text, word2ph, device=device)
     
@@ -2,13 +2,21 @@ import torch
 from transformers import AutoTokenizer, AutoModelForMaskedLM
 import sys
 
+from . import _bert_registry
+
 # model_id = 'bert-base-uncased'
 model_id = '/app/bert_models/hub/models--bert-base-uncased/snapshots/main'
-tokenizer = AutoTokenizer.from_pretrained(model_id)
-model = None
+
+
+def _load_model(device):
+    def loader():
+        model = AutoModelForMaskedLM.from_pretrained(model_id).to(device)
+        tokenizer = AutoTokenizer.from_pretrained(model_id)
+        return model, tokenizer
+    return _bert_registry.get_model(model_id, loader, device)
+
 
 def get_bert_feature(text, word2ph, device=None):
-    global model
     if (
         sys.platform == "darwin"
         and torch.backends.mps.is_available()
@@ -17,10 +25,7 @@ def get_bert_feature(text, word2ph, device=None):
         device = "mps"
     if not device:
         device = "cuda"
-    if model is None:
-        model = AutoModelForMaskedLM.from_pretrained(model_id).to(
-            device
-        )
+    model, tokenizer = _load_model(device)
     with torch.no_grad():
         inputs = tokenizer(text, return_tensors="pt")
         for i in inputs:
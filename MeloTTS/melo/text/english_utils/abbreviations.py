@@ -1,125 +1,169 @@
 import re
 
+import ahocorasick
+
 # ============================================================
 # 第一类：全大写缩写 —— 逐字母拼读（字母之间加空格）
 # 这些缩写在英语中通常按字母逐个读出，而不是作为单词发音。
 # ============================================================
-abbreviations_spell_out = [
-    (re.compile(r'\b%s\b' % x[0]), x[1])
-    for x in [
-        # 技术术语
-        ("API",  "A P I"),
-        ("SDK",  "S D K"),
-        ("NFT",  "N F T"),
-        ("GPU",  "G P U"),
-        ("CPU",  "C P U"),
-        ("SSD",  "S S D"),
-        ("HDD",  "H D D"),
-        ("USB",  "U S B"),
-        ("URL",  "U R L"),
-        ("HTML", "H T M L"),
-        ("CSS",  "C S S"),
-        ("SQL",  "S Q L"),
-        ("PDF",  "P D F"),
-        ("ATM",  "A T M"),
-        ("STM",  "S T M"),
-        # 人工智能
-        ("AI",   "A I"),
-        ("ML",   "M L"),
-        ("NLP",  "N L P"),
-        ("LLM",  "L L M"),
-        ("TTS",  "T T S"),
-        ("ASR",  "A S R"),
-        # 组织与机构
-        ("FBI",  "F B I"),
-        ("CIA",  "C I A"),
-        ("WHO",  "W H O"),
-        ("UN",   "U N"),
-        ("EU",   "E U"),
-        ("IT",   "I T"),
-        ("HR",   "H R"),
-        ("PR",   "P R"),
-        # 通信与网络
-        ("IP",   "I P"),
-        ("TCP",  "T C P"),
-        ("UDP",  "U D P"),
-        ("VPN",  "V P N"),
-        ("DNS",  "D N S"),
-        ("HTTP", "H T T P"),
-        ("SSH",  "S S H"),
-        ("IoT",  "I o T"),
-        # 其他常见
-        ("CEO",  "C E O"),
-        ("CTO",  "C T O"),
-        ("CFO",  "C F O"),
-        ("COO",  "C O O"),
-        ("ID",   "I D"),
-        ("OK",   "O K"),
-        ("TV",   "T V"),
-        ("DJ",   "D J"),
-        ("GPS",  "G P S"),
-        ("PIN",  "P I N"),
-        ("LED",  "L E D"),
-        ("LCD",  "L C D"),
-    ]
+_spell_out_pairs = [
+    # 技术术语
+    ("API",  "A P I"),
+    ("SDK",  "S D K"),
+    ("NFT",  "N F T"),
+    ("GPU",  "G P U"),
+    ("CPU",  "C P U"),
+    ("SSD",  "S S D"),
+    ("HDD",  "H D D"),
+    ("USB",  "U S B"),
+    ("URL",  "U R L"),
+    ("HTML", "H T M L"),
+    ("CSS",  "C S S"),
+    ("SQL",  "S Q L"),
+    ("PDF",  "P D F"),
+    ("ATM",  "A T M"),
+    ("STM",  "S T M"),
+    # 人工智能
+    ("AI",   "A I"),
+    ("ML",   "M L"),
+    ("NLP",  "N L P"),
+    ("LLM",  "L L M"),
+    ("TTS",  "T T S"),
+    ("ASR",  "A S R"),
+    # 组织与机构
+    ("FBI",  "F B I"),
+    ("CIA",  "C I A"),
+    ("WHO",  "W H O"),
+    ("UN",   "U N"),
+    ("EU",   "E U"),
+    ("IT",   "I T"),
+    ("HR",   "H R"),
+    ("PR",   "P R"),
+    # 通信与网络
+    ("IP",   "I P"),
+    ("TCP",  "T C P"),
+    ("UDP",  "U D P"),
+    ("VPN",  "V P N"),
+    ("DNS",  "D N S"),
+    ("HTTP", "H T T P"),
+    ("SSH",  "S S H"),
+    ("IoT",  "I o T"),
+    # 其他常见
+    ("CEO",  "C E O"),
+    ("CTO",  "C T O"),
+    ("CFO",  "C F O"),
+    ("COO",  "C O O"),
+    ("ID",   "I D"),
+    ("OK",   "O K"),
+    ("TV",   "T V"),
+    ("DJ",   "D J"),
+    ("GPS",  "G P S"),
+    ("PIN",  "P I N"),
+    ("LED",  "L E D"),
+    ("LCD",  "L C D"),
 ]
 
 # ============================================================
 # 第二类：通用缩写 —— 展开为完整英文单词
 # ============================================================
-abbreviations_general = [
-    (re.compile(r'\betc\.\b',  re.IGNORECASE), 'etcetera'),
-    (re.compile(r'\be\.g\.\b', re.IGNORECASE), 'for example'),
-    (re.compile(r'\bi\.e\.\b', re.IGNORECASE), 'that is'),
-    (re.compile(r'\bvs\.\b',   re.IGNORECASE), 'versus'),
-    (re.compile(r'\bext\.\b',  re.IGNORECASE), 'extension'),
-    (re.compile(r'\bno\.\b',   re.IGNORECASE), 'number'),
-    (re.compile(r'\bvol\.\b',  re.IGNORECASE), 'volume'),
-    (re.compile(r'\bdept\.\b', re.IGNORECASE), 'department'),
-    (re.compile(r'\bapprox\.\b', re.IGNORECASE), 'approximately'),
-    (re.compile(r'\binc\.\b',  re.IGNORECASE), 'incorporated'),
-    (re.compile(r'\bcorp\.\b', re.IGNORECASE), 'corporation'),
+_general_pairs = [
+    ("etc",    "etcetera"),
+    ("e.g",    "for example"),
+    ("i.e",    "that is"),
+    ("vs",     "versus"),
+    ("ext",    "extension"),
+    ("no",     "number"),
+    ("vol",    "volume"),
+    ("dept",   "department"),
+    ("approx", "approximately"),
+    ("inc",    "incorporated"),
+    ("corp",   "corporation"),
 ]
 
 # ============================================================
 # 第三类：称谓与军衔缩写 —— 原有缩写词典（带句点后缀）
 # ============================================================
-abbreviations_en = [
-    (re.compile("\\b%s\\." % x[0], re.IGNORECASE), x[1])
-    for x in [
-        ("mrs", "misess"),
-        ("mr", "mister"),
-        ("dr", "doctor"),
-        ("st", "saint"),
-        ("co", "company"),
-        ("jr", "junior"),
-        ("maj", "major"),
-        ("gen", "general"),
-        ("drs", "doctors"),
-        ("rev", "reverend"),
-        ("lt", "lieutenant"),
-        ("hon", "honorable"),
-        ("sgt", "sergeant"),
-        ("capt", "captain"),
-        ("esq", "esquire"),
-        ("ltd", "limited"),
-        ("col", "colonel"),
-        ("ft", "fort"),
-    ]
+_title_pairs = [
+    ("mrs", "misess"),
+    ("mr", "mister"),
+    ("dr", "doctor"),
+    ("st", "saint"),
+    ("co", "company"),
+    ("jr", "junior"),
+    ("maj", "major"),
+    ("gen", "general"),
+    ("drs", "doctors"),
+    ("rev", "reverend"),
+    ("lt", "lieutenant"),
+    ("hon", "honorable"),
+    ("sgt", "sergeant"),
+    ("capt", "captain"),
+    ("esq", "esquire"),
+    ("ltd", "limited"),
+    ("col", "colonel"),
+    ("ft", "fort"),
 ]
 
+# ============================================================
+# 替换规则按以下顺序逐条应用，每条规则作用于前一条替换后的文本：
+# 1. 先处理全大写缩写（逐字母拼读），避免被后续规则干扰
+# 2. 处理通用缩写（展开为完整单词）
+# 3. 处理称谓/军衔缩写
+# 后面规则的词边界取决于前面的替换结果（如 "mr.mrs.dr." 中 "mrs." 展开后 "dr." 前为字母，不再展开），
+# 因此不能把多条规则合并为一个交替正则或一次扫描。
+# ============================================================
+_rules = (
+    [(re.compile(r'\b%s\b' % k), v, k) for k, v in _spell_out_pairs]
+    + [(re.compile(r'\b%s\.\b' % re.escape(k), re.IGNORECASE), v, k) for k, v in _general_pairs]
+    + [(re.compile(r'\b%s\.' % k, re.IGNORECASE), v, k) for k, v in _title_pairs]
+)
+
+# ============================================================
+# Aho-Corasick 预筛（pyahocorasick）：绝大多数文本只含极少几个缩写，
+# 先对文本做一次线性扫描找出可能命中的规则，只对这些规则执行 re.sub，
+# 跳过其余七八十次整段扫描；结果与逐条替换完全相同。
+# 扫描前的大小写折叠须覆盖 re.IGNORECASE 认为与 ASCII 字母相同的全部字符，
+# 且逐字符一一映射，才不会漏掉正则能匹配的位置。
+# ============================================================
+_FOLD_TABLE = str.maketrans({
+    **{chr(c): chr(c + 32) for c in range(ord("A"), ord("Z") + 1)},
+    "\u0130": "i",  # İ
+    "\u0131": "i",  # ı
+    "\u017f": "s",  # ſ
+    "\u212a": "k",  # K（开尔文符号）
+})
+
+
+def _build_automaton(rules):
+    indices = {}
+    for idx, (_, _, key) in enumerate(rules):
+        indices.setdefault(key.translate(_FOLD_TABLE), []).append(idx)
+    automaton = ahocorasick.Automaton()
+    for key, idxs in indices.items():
+        automaton.add_word(key, idxs)
+    automaton.make_automaton()
+    return automaton
+
+
+_automaton = _build_automaton(_rules)
+
+
+def _candidate_rules(text):
+    """返回文本中出现了关键字（不区分大小写）的规则下标集合，是可能命中规则的超集。"""
+    return {idx for _, idxs in _automaton.iter(text.translate(_FOLD_TABLE)) for idx in idxs}
+
+
 def expand_abbreviations(text, lang="en"):
     if lang == "en":
-        # 按顺序应用三类缩写规则：
-        # 1. 先处理全大写缩写（逐字母拼读），避免被后续规则干扰
-        for regex, replacement in abbreviations_spell_out:
-            text = re.sub(regex, replacement, text)
-        # 2. 处理通用缩写（展开为完整单词）
-        for regex, replacement in abbreviations_general:
-            text = re.sub(regex, replacement, text)
-        # 3. 处理称谓/军衔缩写
-        for regex, replacement in abbreviations_en:
-            text = re.sub(regex, replacement, text)
+        candidates = _candidate_rules(text)
+        for idx, (regex, replacement, _) in enumerate(_rules):
+            if idx not in candidates:
+                continue
+            expanded = regex.sub(replacement, text)
+            if expanded != text:
+                text = expanded
+                # 替换可能引入或消除后续规则的关键字，重新扫描
+                candidates = _candidate_rules(text)
     else:
         raise NotImplementedError()
     return text
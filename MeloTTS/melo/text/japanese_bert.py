@@ -2,13 +2,18 @@ import torch
 from transformers import AutoTokenizer, AutoModelForMaskedLM
 import sys
 
+from . import _bert_registry
+
+
+def _load_model(device, model_id):
+    def loader():
+        model = AutoModelForMaskedLM.from_pretrained(model_id).to(device)
+        tokenizer = AutoTokenizer.from_pretrained(model_id)
+        return model, tokenizer
+    return _bert_registry.get_model(model_id, loader, device)
 
-models = {}
-tokenizers = {}
-def get_bert_feature(text, word2ph, device=None, model_id='tohoku-nlp/bert-base-japanese-v3'):
-    global model
-    global tokenizer
 
+def get_bert_feature(text, word2ph, device=None, model_id='tohoku-nlp/bert-base-japanese-v3'):
     if (
         sys.platform == "darwin"
         and torch.backends.mps.is_available()
@@ -17,17 +22,7 @@ def get_bert_feature(text, word2ph, device=None, model_id='tohoku-nlp/bert-base-
         device = "mps"
     if not device:
         device = "cuda"
-    if model_id not in models:
-        model = AutoModelForMaskedLM.from_pretrained(model_id).to(
-            device
-        )
-        models[model_id] = model
-        tokenizer = AutoTokenizer.from_pretrained(model_id)
-        tokenizers[model_id] = tokenizer
-    else:
-        model = models[model_id]
-        tokenizer = tokenizers[model_id]
-
+    model, tokenizer = _load_model(device, model_id)
 
     with torch.no_grad():
         inputs = tokenizer(text, return_tensors="pt")
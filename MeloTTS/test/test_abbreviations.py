@@ -0,0 +1,73 @@
+import random
+
+import pytest
+
+from melo.text.english_utils.abbreviations import (
+    _general_pairs,
+    _rules,
+    _spell_out_pairs,
+    _title_pairs,
+    expand_abbreviations,
+)
+
+
+# 期望值为原始实现（逐条 re.sub）的输出
+BASELINE_CASES = [
+    ("The API and SDK docs are online.", "The A P I and S D K docs are online."),
+    ("Mrs. Smith met Mr. Brown and Dr. Lee.", "misess Smith met mister Brown and doctor Lee."),
+    ("Drs. Wang and Capt. Li, Ltd. Co.", "doctors Wang and captain Li, limited company"),
+    ("Bring pens, paper, etc.and a notebook.", "Bring pens, paper, etceteraand a notebook."),
+    ("See e.g.this example, i.e.that one.", "See for examplethis example, that isthat one."),
+    ("NOTE: IDs, APIs and OKAY are not abbreviations.", "NOTE: IDs, APIs and OKAY are not abbreviations."),
+    ("api and Api stay as they are; only API is spelled out.", "api and Api stay as they are; only A P I is spelled out."),
+    ("St. Louis vs.Chicago, no.5 vol.2", "saint Louis versusChicago, number5 volume2"),
+    ("IoT devices use TCP/IP over a VPN.", "I o T devices use T C P/I P over a V P N."),
+    # 连写的缩写：前一条规则的替换结果决定后一条规则的词边界
+    ("Mr.St. Louis", "misterSt. Louis"),
+    ("mr.mrs.dr.", "mistermisessdr."),
+    ("Drs.Dr.", "doctorsdoctor"),
+    ("i.e.Mrs. Lee", "that isMrs. Lee"),
+    # re.IGNORECASE 下与 ASCII 字母等价的非 ASCII 字符
+    ("ſt. Louis and Mſ. ſmith", "saint Louis and Mſ. ſmith"),
+    ("İ.e.x and ı.e.x", "that isx and that isx"),
+    ("5 K. ltd.com", "5 K. limitedcom"),
+    ("", ""),
+    ("没有英文缩写的中文句子。", "没有英文缩写的中文句子。"),
+    ("中文里夹着 GPU 和 Dr. 的句子", "中文里夹着 G P U 和 doctor 的句子"),
+]
+
+
+def _expand_sequential(text):
+    # 不经 Aho-Corasick 预筛，逐条执行全部规则
+    for regex, replacement, _ in _rules:
+        text = regex.sub(replacement, text)
+    return text
+
+
+@pytest.mark.parametrize("text, expected", BASELINE_CASES)
+def test_matches_baseline(text, expected):
+    assert expand_abbreviations(text) == expected
+
+
+def test_prefilter_matches_sequential_random():
+    rng = random.Random(0)
+    words = ["the", "model", "noted", "idle", "Mrs", "co", "a", "_x", "42", "语音", "ſ", "İ"]
+    abbrs = (
+        [k for k, _ in _spell_out_pairs]
+        + [k + "." for k, _ in _general_pairs]
+        + [k.capitalize() + "." for k, _ in _title_pairs]
+        + [k.upper() + "." for k, _ in _title_pairs]
+    )
+    separators = [" ", "", ", ", ".", "-", "_", "\n"]
+    for _ in range(2000):
+        pieces = []
+        for _ in range(rng.randint(1, 20)):
+            pieces.append(rng.choice(abbrs) if rng.random() < 0.4 else rng.choice(words))
+            pieces.append(rng.choice(separators))
+        text = "".join(pieces)
+        assert expand_abbreviations(text) == _expand_sequential(text), text
+
+
+def test_unsupported_language():
+    with pytest.raises(NotImplementedError):
+        expand_abbreviations("Dr.", lang="zh")
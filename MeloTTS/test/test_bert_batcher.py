@@ -0,0 +1,61 @@
+import concurrent.futures
+
+import pytest
+
+from melo.text.bert_batcher import BucketBatcher
+
+
+def _submit_all(batcher, n):
+    return [batcher.submit(f"t{i}", [1] * (i + 1)) for i in range(n)]
+
+
+def test_results_are_dispatched_in_order():
+    batcher = BucketBatcher(lambda texts, word2phs: [t.upper() for t in texts], max_wait_ms=5)
+    futures = _submit_all(batcher, 8)
+    assert [f.result(timeout=5) for f in futures] == [f"T{i}" for i in range(8)]
+
+
+@pytest.mark.parametrize("batch_fn", [
+    lambda texts, word2phs: texts[:-1],
+    lambda texts, word2phs: texts + ["extra"],
+    lambda texts, word2phs: None,
+])
+def test_result_count_mismatch_fails_every_future(batch_fn):
+    batcher = BucketBatcher(batch_fn, max_wait_ms=5)
+    futures = _submit_all(batcher, 4)
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=5)
+
+
+def test_worker_survives_unexpected_errors():
+    calls = []
+
+    def batch_fn(texts, word2phs):
+        calls.append(len(texts))
+        return texts
+
+    batcher = BucketBatcher(batch_fn, max_wait_ms=5)
+    # 模拟分桶阶段（batch_fn 之外）的异常
+    batcher._bucket_index = lambda length: 1 / 0
+    future = batcher.submit("a", [1])
+    with pytest.raises(ZeroDivisionError):
+        future.result(timeout=5)
+    assert batcher.alive
+
+    del batcher._bucket_index
+    assert batcher.submit("b", [1]).result(timeout=5) == "b"
+    assert calls == [1]
+
+
+def test_get_bert_falls_back_on_timeout(monkeypatch):
+    import melo.text as text
+
+    blocker = concurrent.futures.Future()
+    batcher = BucketBatcher(lambda texts, word2phs: blocker.result(), max_wait_ms=0, result_timeout=0.05)
+    monkeypatch.setitem(text._bert_batchers, "ZH", batcher)
+    monkeypatch.setitem(text._bert_feature_fns, "ZH", lambda norm_text, word2ph, device: ("direct", norm_text))
+    try:
+        assert text.get_bert("你好", [1, 1], "ZH", "cpu") == ("direct", "你好")
+    finally:
+        blocker.set_result(["late"])
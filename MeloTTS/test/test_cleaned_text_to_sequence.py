@@ -0,0 +1,19 @@
+import pytest
+
+from melo.text import cleaned_text_to_sequence
+from melo.text.symbols import language_id_map, language_tone_start_map
+
+
+@pytest.mark.parametrize("language", sorted(language_tone_start_map))
+def test_empty_input(language):
+    assert cleaned_text_to_sequence([], [], language) == ([], [], [])
+
+
+@pytest.mark.parametrize("language", sorted(language_tone_start_map))
+def test_tones_are_offset_as_python_ints(language):
+    phones, tones, lang_ids = cleaned_text_to_sequence(["_", "a", "_"], [0, 1, 0], language)
+    start = language_tone_start_map[language]
+    assert tones == [start, start + 1, start]
+    assert all(type(t) is int for t in tones)
+    assert lang_ids == [language_id_map[language]] * 3
+    assert len(phones) == 3
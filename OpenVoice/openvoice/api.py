@@ -143,21 +143,41 @@ class ToneColorConverter(OpenVoiceBaseClass):
         # load audio
         audio, sample_rate = librosa.load(audio_src_path, sr=hps.data.sampling_rate)
         audio = torch.tensor(audio).float()
-        
+
+        audio = self.convert_from_waveform(audio, sample_rate, src_se, tgt_se, tau=tau, message=message)
+        audio = audio.cpu().numpy()
+        if output_path is None:
+            return audio
+        else:
+            soundfile.write(output_path, audio, hps.data.sampling_rate)
+
+    def convert_from_waveform(self, audio, sr, src_se, tgt_se, tau=0.3, message="default", watermark=True):
+        """对内存中的波形做音色转换，返回 hps.data.sampling_rate 采样率的 float32 张量（位于 self.device）。
+
+        与 convert 相同，但跳过音频文件的读写；sr 与模型采样率不同时在 self.device 上重采样。
+        分段转换后再拼接时可传 watermark=False，最后对整段调用一次 add_watermark。
+        """
+        hps = self.hps
         with torch.no_grad():
-            y = torch.FloatTensor(audio).to(self.device)
+            y = torch.as_tensor(audio, dtype=torch.float32).to(self.device)
+            if sr != hps.data.sampling_rate:
+                try:
+                    import torchaudio.functional as AF
+                    y = AF.resample(y, sr, hps.data.sampling_rate)
+                except ImportError:
+                    y = torch.from_numpy(
+                        librosa.resample(y.cpu().numpy(), orig_sr=sr, target_sr=hps.data.sampling_rate)
+                    ).to(self.device)
             y = y.unsqueeze(0)
             spec = spectrogram_torch(y, hps.data.filter_length,
                                     hps.data.sampling_rate, hps.data.hop_length, hps.data.win_length,
                                     center=False).to(self.device)
             spec_lengths = torch.LongTensor([spec.size(-1)]).to(self.device)
             audio = self.model.voice_conversion(spec, spec_lengths, sid_src=src_se, sid_tgt=tgt_se, tau=tau)[0][
-                        0, 0].data.cpu().float().numpy()
-            audio = self.add_watermark(audio, message)
-            if output_path is None:
-                return audio
-            else:
-                soundfile.write(output_path, audio, hps.data.sampling_rate)
+                        0, 0].data.float()
+            if watermark and self.watermark_model is not None:
+                audio = torch.from_numpy(self.add_watermark(audio.cpu().numpy(), message)).to(self.device)
+            return audio
     
     def add_watermark(self, audio, message):
         if self.watermark_model is None:
@@ -0,0 +1,158 @@
+"""multipart/form-data 请求体的增量解析，供 server.py 中 VoiceCloneHandler 流式接收上传文件。"""
+import re
+import tempfile
+
+import tornado.httputil
+
+
+# Content-Disposition 参数：key=value 或 key="quoted value"（引号内可含 ; 与 \" 转义）
+_DISPOSITION_PARAM_RE = re.compile(r';\s*([^\s=;]+)\s*=\s*("(?:[^"\\]|\\.)*"|[^;]*)')
+
+
+def parse_content_disposition(value: str):
+    """解析 Content-Disposition 头，返回 (类型小写, {参数名小写: 值})。"""
+    disp_type, sep, rest = value.partition(";")
+    params = {}
+    for match in _DISPOSITION_PARAM_RE.finditer(sep + rest):
+        key, val = match.group(1).lower(), match.group(2).strip()
+        if len(val) >= 2 and val[0] == val[-1] == '"':
+            val = re.sub(r'\\(.)', r'\1', val[1:-1])
+        params[key] = val
+    return disp_type.strip().lower(), params
+
+
+class MultipartStreamParser:
+    """增量解析 multipart/form-data 请求体。
+
+    file_field 对应的文件分段边接收边写入临时文件，其余字段（URL / base64 等）
+    保存在内存中，整个上传过程内存占用恒定，不必等请求体完整接收后再解析。
+    """
+
+    # 普通字段的大小上限，避免把大文件误当作字段缓存进内存
+    MAX_FIELD_BYTES = 16 * 1024 * 1024
+
+    def __init__(self, boundary: bytes, file_field: str = "ref_audio", suffix: str = ".wav", tmp_dir: str = None):
+        self._first_delim = b"--" + boundary
+        self._delim = b"\r\n--" + boundary
+        self._file_field = file_field
+        self._suffix = suffix
+        self._tmp_dir = tmp_dir
+        self._buf = bytearray()
+        self._state = "preamble"
+        self._sink = None
+        self._field_name = None
+        self._field_value = None
+        self.fields = {}
+        self.file_path = None
+
+    def feed(self, chunk: bytes):
+        self._buf += chunk
+        while self._step():
+            pass
+
+    @property
+    def complete(self) -> bool:
+        """是否已读到结尾分隔符 (--boundary--)。"""
+        return self._state == "done"
+
+    def finish(self):
+        """请求体接收完毕后调用：关闭临时文件，未读到结尾分隔符时抛出 ValueError。
+
+        未结束的请求体（客户端中断、截断）中的文件内容不完整，不能交给后续处理。
+        """
+        self.close()
+        if not self.complete:
+            raise ValueError("multipart 请求体不完整，缺少结尾分隔符")
+
+    def close(self):
+        """关闭临时文件句柄（不删除文件，由调用方负责清理）。"""
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+
+    def _step(self) -> bool:
+        buf = self._buf
+        if self._state == "preamble":
+            idx = buf.find(self._first_delim)
+            if idx < 0:
+                # 保留可能被截断的分隔符前缀
+                del buf[:max(0, len(buf) - len(self._first_delim) + 1)]
+                return False
+            del buf[:idx + len(self._first_delim)]
+            self._state = "boundary"
+            return True
+
+        if self._state == "boundary":
+            if len(buf) < 2:
+                return False
+            if buf[:2] == b"--":
+                self._state = "done"
+                buf.clear()
+                return False
+            if buf[:2] != b"\r\n":
+                raise ValueError("multipart 分隔符格式错误")
+            del buf[:2]
+            self._state = "headers"
+            return True
+
+        if self._state == "headers":
+            idx = buf.find(b"\r\n\r\n")
+            if idx < 0:
+                if len(buf) > 64 * 1024:
+                    raise ValueError("multipart 分段头过长")
+                return False
+            headers = tornado.httputil.HTTPHeaders.parse(buf[:idx].decode("utf-8"))
+            del buf[:idx + 4]
+            self._begin_part(headers)
+            self._state = "body"
+            return True
+
+        if self._state == "body":
+            idx = buf.find(self._delim)
+            if idx < 0:
+                # 末尾可能是分隔符的前半段，暂不写出
+                keep = len(self._delim) - 1
+                if len(buf) > keep:
+                    self._write_part(bytes(buf[:len(buf) - keep]))
+                    del buf[:len(buf) - keep]
+                return False
+            self._write_part(bytes(buf[:idx]))
+            del buf[:idx + len(self._delim)]
+            self._end_part()
+            self._state = "boundary"
+            return True
+
+        # done：忽略结尾之后的内容
+        buf.clear()
+        return False
+
+    def _begin_part(self, headers):
+        disp_type, disp_params = parse_content_disposition(headers.get("Content-Disposition", ""))
+        if disp_type != "form-data" or "name" not in disp_params:
+            raise ValueError("multipart 分段缺少 Content-Disposition name")
+        self._field_name = disp_params["name"]
+        is_file = "filename" in disp_params or "filename*" in disp_params
+        if self._field_name == self._file_field and is_file and self.file_path is None:
+            self._sink = tempfile.NamedTemporaryFile(suffix=self._suffix, dir=self._tmp_dir, delete=False)
+            self.file_path = self._sink.name
+            self._field_value = None
+        else:
+            self._field_value = bytearray()
+
+    def _write_part(self, data: bytes):
+        if not data:
+            return
+        if self._field_value is None:
+            self._sink.write(data)
+            return
+        self._field_value += data
+        if len(self._field_value) > self.MAX_FIELD_BYTES:
+            raise ValueError(f"字段 {self._field_name} 过大")
+
+    def _end_part(self):
+        if self._field_value is None:
+            self.close()
+        else:
+            self.fields[self._field_name] = self._field_value.decode("utf-8", errors="replace")
+        self._field_name = None
+        self._field_value = None
@@ -17,16 +17,30 @@ import tempfile
 import argparse
 import base64
 import hashlib
+import math
+import shutil
+import functools
+import threading
+import collections
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from fractions import Fraction
 from pathlib import Path
 from urllib.parse import urlparse
 
 import torch
+import torchaudio
+import safetensors.torch
 import numpy as np
-import librosa
 import soundfile as sf
 import tornado.ioloop
 import tornado.web
 import tornado.httputil
+import tornado.iostream
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # ---------------------------------------------------------------------------
 # 路径配置：将 MeloTTS / OpenVoice 加入 sys.path
@@ -35,8 +49,12 @@ ROOT_DIR = Path(__file__).parent
 sys.path.insert(0, str(ROOT_DIR / "MeloTTS"))
 sys.path.insert(0, str(ROOT_DIR / "OpenVoice"))
 
+from openvoice import utils as openvoice_utils
 from openvoice.api import ToneColorConverter
 from melo.api import TTS as MeloTTS
+from melo.text import enable_bert_batching
+
+from multipart_stream import MultipartStreamParser
 
 # ---------------------------------------------------------------------------
 # 日志
@@ -89,6 +107,57 @@ LANG_SE_MAP = {
 }
 
 
+# 各语言的预热文本
+WARMUP_TEXTS = {
+    "ZH": "你好。",
+    "EN": "Hello.",
+    "EN_V2": "Hello.",
+    "FR": "Bonjour.",
+    "JP": "こんにちは。",
+    "ES": "Hola.",
+    "KR": "안녕하세요.",
+}
+
+# 流式 PCM 响应的分块大小（采样点数），客户端可按固定帧长处理
+STREAM_CHUNK_SAMPLES = 17920
+
+# 允许的输出采样率；重采样核按采样率对缓存，任意采样率会生成极大的滤波器核
+SUPPORTED_SAMPLE_RATES = (8000, 16000, 22050, 24000, 32000, 44100, 48000)
+
+# 重采样器缓存上限（条目数，输出采样率与音高变换共用），超出后淘汰最久未使用的
+RESAMPLER_CACHE_SIZE = 32
+
+# 音高变换的伸缩比近似为分母不超过该值的分数，重采样核不超过约 2.4MB，音高误差小于 0.1 音分
+PITCH_RATE_MAX_DENOMINATOR = 512
+
+# 参考音频临时文件默认放在 tmpfs（/dev/shm）上，剩余空间不足该值时退回系统临时目录；
+# Docker 默认的 /dev/shm 只有 64MB，小于 Tornado 默认 100MB 的请求体上限
+REF_AUDIO_SHM_MIN_FREE = 256 * 1024 * 1024
+
+# 克隆音色输出的水印内容
+WATERMARK_MESSAGE = "@MyShell"
+
+# 克隆音色清单文件名（位于克隆数据目录），记录 speaker_id -> {lang, path}
+CLONE_MANIFEST_NAME = "clones_manifest.json"
+
+
+# ---------------------------------------------------------------------------
+# JSON 序列化：优先 orjson（输出 UTF-8，不转义中文），未安装时退回标准库
+# ---------------------------------------------------------------------------
+def json_dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+def json_body(code: int, message: str, data: dict = None) -> bytes:
+    """统一 JSON 响应体 {code, message[, data]}，序列化为字节。"""
+    body = {"code": code, "message": message}
+    if data is not None:
+        body["data"] = data
+    return json_dumps(body)
+
+
 # ---------------------------------------------------------------------------
 # 自定义拼音词典加载
 # ---------------------------------------------------------------------------
@@ -114,13 +183,78 @@ def _load_custom_pinyin(dict_path: str):
         logger.error("加载自定义拼音词典失败: %s - %s", dict_path, e)
 
 
+class StreamWatermarker:
+    """逐句流式输出克隆音色时加水印，结果与整段拼接后调用一次 add_watermark 相同。
+
+    add_watermark 只改写整段开头 (2 * n_repeat - 1) 个 16000 点窗口范围内的音频，逐句调用时
+    不足一个窗口的短句会被整句跳过。这里暂存转换后的音频直到覆盖该范围（或流结束），
+    对暂存部分加一次水印后放行，之后的音频直接通过。
+    """
+
+    # ToneColorConverter.add_watermark 中每个水印窗口的采样点数
+    WINDOW = 16000
+
+    def __init__(self, converter: ToneColorConverter, message: str, lock: threading.Lock):
+        self._converter = converter
+        self._message = message
+        self._lock = lock
+        n_repeat = len(openvoice_utils.string_to_bits(message).reshape(-1)) // 32
+        enabled = converter.watermark_model is not None and n_repeat > 0
+        self._span = (2 * n_repeat - 1) * self.WINDOW if enabled else 0
+        self._pending = []
+        self._pending_len = 0
+        self._done = not enabled
+
+    def push(self, audio_t: torch.Tensor) -> list[torch.Tensor]:
+        """送入一句转换后的音频，返回现在可以输出的张量（可能为空）。"""
+        if self._done:
+            return [audio_t]
+        self._pending.append(audio_t)
+        self._pending_len += audio_t.numel()
+        if self._pending_len < self._span:
+            return []
+        return self.flush()
+
+    def flush(self) -> list[torch.Tensor]:
+        """对暂存的音频加水印并全部放行，之后的音频不再加水印。"""
+        self._done = True
+        if not self._pending:
+            return []
+        audio_t = torch.cat(self._pending)
+        self._pending, self._pending_len = [], 0
+        with self._lock:
+            audio_np = self._converter.add_watermark(audio_t.cpu().numpy(), self._message)
+        return [torch.from_numpy(audio_np).to(audio_t.device)]
+
+
+class AudioRechunker:
+    """把任意长度的 PCM 字节流重新切分为固定大小的块，flush 时输出不足一块的剩余部分。"""
+
+    def __init__(self, chunk_bytes: int):
+        self.chunk_bytes = chunk_bytes
+        self._buf = bytearray()
+
+    def push(self, data: bytes):
+        self._buf += data
+        while len(self._buf) >= self.chunk_bytes:
+            yield bytes(self._buf[:self.chunk_bytes])
+            del self._buf[:self.chunk_bytes]
+
+    def flush(self):
+        if self._buf:
+            yield bytes(self._buf)
+            self._buf.clear()
+
+
 # ============================================================================
 # TTSEngine：封装 MeloTTS + OpenVoice
 # ============================================================================
 class TTSEngine:
     """TTS 引擎，管理 MeloTTS 模型、OpenVoice ToneColorConverter 以及已注册的克隆音色。"""
 
-    def __init__(self, ckpt_converter_dir: str, languages: list[str], device: str = "auto", clone_data_dir: str = None):
+    def __init__(self, ckpt_converter_dir: str, languages: list[str], device: str = "auto", clone_data_dir: str = None,
+                 bert_batch_wait_ms: float = 0.0, warmup: bool = True, compile_decoders: bool = False,
+                 audio_cache_size: int = 128, audio_cache_max_bytes: int = 64 * 1024 * 1024):
         # ------------------------------------------------------------------
         # 设备
         # ------------------------------------------------------------------
@@ -147,6 +281,9 @@ class TTSEngine:
         logger.info("正在加载 ToneColorConverter ...")
         self.tone_color_converter = ToneColorConverter(converter_config, device=self.device)
         self.tone_color_converter.load_ckpt(converter_ckpt)
+        self.tone_color_converter.model.eval()
+        if self.tone_color_converter.watermark_model is not None:
+            self.tone_color_converter.watermark_model.eval()
         logger.info("ToneColorConverter 加载完成")
 
         # ------------------------------------------------------------------
@@ -160,97 +297,385 @@ class TTSEngine:
         self.melo_models: dict[str, MeloTTS] = {}
         self.builtin_speakers: dict[str, dict] = {}  # speaker_id -> {lang, spk_id, name}
 
+        lang_list = []
         for lang in languages:
             lang_upper = lang.upper()
             if lang_upper not in MELO_LANGUAGES:
                 logger.warning("不支持的语言，跳过: %s", lang)
                 continue
-            logger.info("正在加载 MeloTTS 模型: %s ...", lang_upper)
-            try:
-                model = MeloTTS(
-                    language=lang_upper, 
-                    device=self.device,
-                    config_path=f"/app/melo_models/{lang_upper}/config.json",
-                    ckpt_path=f"/app/melo_models/{lang_upper}/checkpoint.pth"
-                )
-                self.melo_models[lang_upper] = model
-                # 获取内置说话人列表
-                spk2id = model.hps.data.spk2id
-                for spk_name, spk_id in spk2id.items():
-                    # 构造唯一的 speaker_id
-                    speaker_key = f"{lang_upper}_{spk_name}" if spk_name != lang_upper else spk_name
-                    self.builtin_speakers[speaker_key] = {
-                        "lang": lang_upper,
-                        "spk_id": spk_id,
-                        "name": spk_name,
-                    }
-                logger.info("MeloTTS %s 加载完成，说话人: %s", lang_upper, list(spk2id.keys()))
-            except Exception as e:
-                logger.error("加载 MeloTTS %s 失败: %s", lang_upper, e)
+            if lang_upper not in lang_list:
+                lang_list.append(lang_upper)
+
+        # 各语言并行加载（磁盘读取与 H2D 拷贝均释放 GIL），结果按配置顺序写入，
+        # 保证第一个语言仍是默认模型
+        if lang_list:
+            with ThreadPoolExecutor(max_workers=len(lang_list)) as pool:
+                futures = {pool.submit(self._load_one_melo, lang_upper): lang_upper for lang_upper in lang_list}
+                results = {}
+                for future in as_completed(futures):
+                    lang_upper = futures[future]
+                    try:
+                        results[lang_upper] = future.result()
+                    except Exception as e:
+                        logger.error("加载 MeloTTS %s 失败: %s", lang_upper, e)
+            for lang_upper in lang_list:
+                if lang_upper in results:
+                    _, model, speakers = results[lang_upper]
+                    self.melo_models[lang_upper] = model
+                    self.builtin_speakers.update(speakers)
 
         if not self.melo_models:
             raise RuntimeError("没有成功加载任何 MeloTTS 模型")
 
+        # 默认语言（第一个加载的模型）及各语言的默认 speaker ID，避免每次请求重新遍历
+        self._default_lang = next(iter(self.melo_models))
+        self._default_spk_id_for_lang: dict[str, int] = {
+            lang: next(iter(model.hps.data.spk2id.values())) for lang, model in self.melo_models.items()
+        }
+
+        # MeloTTS 推理不保证可重入：同一语言模型的推理串行化，不同语言可并行
+        self._model_locks: dict[str, threading.Lock] = {lang: threading.Lock() for lang in self.melo_models}
+
         # ------------------------------------------------------------------
-        # 克隆音色存储：speaker_id -> {se: Tensor, lang: str}
+        # BERT 分桶批处理：并发请求的句子按长度合并为一次 BERT 前向
+        # ------------------------------------------------------------------
+        if bert_batch_wait_ms > 0:
+            for model in self.melo_models.values():
+                if enable_bert_batching(model.language, self.device, max_wait_ms=bert_batch_wait_ms):
+                    logger.info("已启用 BERT 分桶批处理: %s (等待 %.1f ms)", model.language, bert_batch_wait_ms)
+
+        # ------------------------------------------------------------------
+        # 克隆音色存储：speaker_id -> {se: Tensor | None, lang: str, path: str}
+        # se 为 None 表示尚未从 path 读取，首次使用时由 _get_clone_se 加载
         # ------------------------------------------------------------------
         self.cloned_speakers: dict[str, dict] = {}
+        self._clone_se_lock = threading.Lock()
+        self._manifest_lock = threading.Lock()
+
+        # 音高变换 STFT 用的窗函数与相位推进量：n_fft -> (window, phase_advance)（位于 self.device）
+        self._pitch_stft_buffers: dict[int, tuple[torch.Tensor, torch.Tensor]] = {}
+
+        # 重采样器 LRU 缓存：(原采样率, 目标采样率) -> torchaudio Resample（位于 self.device）
+        self._resamplers: collections.OrderedDict[tuple[int, int], torchaudio.transforms.Resample] = \
+            collections.OrderedDict()
+        self._resamplers_lock = threading.Lock()
+
+        # 克隆音色逐句流水线：MeloTTS 生成与音色转换分别在两条 CUDA stream 上执行，
+        # 转换在独立线程中进行，与下一句的生成重叠
+        self._gen_stream = self._conv_stream = self._conv_executor = None
+        if self.device.startswith("cuda"):
+            self._gen_stream = torch.cuda.Stream(device=self.device)
+            self._conv_stream = torch.cuda.Stream(device=self.device)
+            self._conv_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tone-convert")
+
+        # ToneColorConverter 在多个工作线程间共享，调用时串行化
+        self._converter_lock = threading.Lock()
 
         # 克隆数据持久化目录
         self.clone_data_dir = clone_data_dir or os.path.join(str(ROOT_DIR), "voice_clones")
         os.makedirs(self.clone_data_dir, exist_ok=True)
         self._load_cloned_speakers()
 
+        # ------------------------------------------------------------------
+        # 预加载各语言 base speaker SE（已位于 self.device），合成时直接复用
+        # ------------------------------------------------------------------
+        self._source_se_cache: dict[str, torch.Tensor] = {}
+        for lang, se_filename in LANG_SE_MAP.items():
+            se_path = os.path.join(self.base_se_dir, se_filename)
+            if os.path.isfile(se_path):
+                self._source_se_cache[lang] = torch.load(se_path, map_location=self.device).contiguous()
+
+        # ------------------------------------------------------------------
+        # 查询接口响应：能力与语言列表在启动后不变，说话人列表在克隆后失效重建
+        # ------------------------------------------------------------------
+        self._payload_lock = threading.Lock()
+        self._speakers_bytes = None
+        self.capabilities_payload = json_body(0, "成功", {
+            "model_type": "openvoice_melo",
+            "features": ["tts", "voice_clone"],
+        })
+        self.languages_payload = json_body(0, "成功", {
+            "languages": [MELO_LANGUAGES[lang] for lang in self.melo_models.keys()],
+        })
+
+        # ------------------------------------------------------------------
+        # 合成结果 LRU 缓存：相同文本 / 说话人 / 语速直接复用音色转换后的音频，跳过整条模型推理
+        # 缓存张量位于 self.device，命中后直接进入设备上的后处理；
+        # 同时限制条目数与总字节数，长文本不会无限占用显存
+        # ------------------------------------------------------------------
+        self._audio_cache_size = max(0, audio_cache_size)
+        self._audio_cache_max_bytes = max(0, audio_cache_max_bytes)
+        self._audio_cache_bytes = 0
+        self._audio_cache: collections.OrderedDict[tuple, tuple[torch.Tensor, int]] = collections.OrderedDict()
+        self._audio_cache_lock = threading.Lock()
+
+        # ------------------------------------------------------------------
+        # 可选 torch.compile（仅内部解码器），随后预热以摊销编译、CUDA 上下文与 kernel 加载等首请求开销
+        # ------------------------------------------------------------------
+        if compile_decoders:
+            self._compile_decoders()
+        if warmup:
+            self._warmup()
+
         logger.info("TTSEngine 初始化完成")
 
+    def _load_one_melo(self, lang_upper: str) -> tuple[str, MeloTTS, dict]:
+        """加载单个语言的 MeloTTS 模型，返回 (语言, 模型, 内置说话人)。"""
+        logger.info("正在加载 MeloTTS 模型: %s ...", lang_upper)
+        model = MeloTTS(
+            language=lang_upper, 
+            device=self.device,
+            config_path=f"/app/melo_models/{lang_upper}/config.json",
+            ckpt_path=f"/app/melo_models/{lang_upper}/checkpoint.pth"
+        ).eval()
+        # 获取内置说话人列表
+        spk2id = model.hps.data.spk2id
+        speakers = {}
+        for spk_name, spk_id in spk2id.items():
+            # 构造唯一的 speaker_id
+            speaker_key = f"{lang_upper}_{spk_name}" if spk_name != lang_upper else spk_name
+            speakers[speaker_key] = {
+                "lang": lang_upper,
+                "spk_id": spk_id,
+                "name": spk_name,
+            }
+        logger.info("MeloTTS %s 加载完成，说话人: %s", lang_upper, list(spk2id.keys()))
+        return lang_upper, model, speakers
+
+    # ------------------------------------------------------------------
+    # 编译与预热
+    # ------------------------------------------------------------------
+    def _compile_decoders(self):
+        """对 MeloTTS 与 ToneColorConverter 的 HiFi-GAN 解码器应用 torch.compile（动态长度）。"""
+        targets = [(f"MeloTTS {lang}", model.model) for lang, model in self.melo_models.items()]
+        targets.append(("ToneColorConverter", self.tone_color_converter.model))
+        for name, synth in targets:
+            try:
+                synth.dec = torch.compile(synth.dec, dynamic=True)
+                logger.info("已对 %s 解码器启用 torch.compile", name)
+            except Exception as e:
+                logger.warning("%s 解码器 torch.compile 失败，保持 eager: %s", name, e)
+
+    @torch.inference_mode()
+    def _warmup(self):
+        """每个模型合成一句短文本、转换器跑 1 秒静音，触发编译 / CUDA kernel 加载等惰性初始化。"""
+        logger.info("开始预热 ...")
+        for lang, model in self.melo_models.items():
+            try:
+                audio_t = self._melo_tts(
+                    lang, model, WARMUP_TEXTS.get(lang, "Hello."), self._default_spk_id_for_lang[lang], 1.0,
+                    return_tensor=True,
+                )
+                # 默认输出采样率的重采样核
+                model_sr = model.hps.data.sampling_rate
+                self._encode_pcm(self._post_process(audio_t, model_sr, 0.0, 16000))
+            except Exception as e:
+                logger.warning("MeloTTS %s 预热失败: %s", lang, e)
+
+        se = next(iter(self._source_se_cache.values()), None)
+        if se is not None:
+            converter = self.tone_color_converter
+            sr = converter.hps.data.sampling_rate
+            try:
+                with self._converter_lock:
+                    converter.convert_from_waveform(
+                        torch.zeros(sr, device=self.device), sr, se, se, watermark=False,
+                    )
+            except Exception as e:
+                logger.warning("ToneColorConverter 预热失败: %s", e)
+        logger.info("预热完成")
+
+    # ------------------------------------------------------------------
+    # 预序列化的查询接口响应
+    # ------------------------------------------------------------------
+    def speakers_payload(self) -> bytes:
+        """GET /ticos/speakers 的响应体，说话人列表变化前复用缓存。"""
+        with self._payload_lock:
+            if self._speakers_bytes is None:
+                speakers = []
+                # 预设音色
+                for sid in self.builtin_speakers:
+                    speakers.append({"speaker_id": sid, "type": "builtin"})
+                # 克隆音色
+                for sid in self.cloned_speakers:
+                    speakers.append({"speaker_id": sid, "type": "cloned"})
+                self._speakers_bytes = json_body(0, "成功", {"speakers": speakers})
+            return self._speakers_bytes
+
     # ------------------------------------------------------------------
     # 持久化管理
     # ------------------------------------------------------------------
+    def _manifest_path(self) -> str:
+        return os.path.join(self.clone_data_dir, CLONE_MANIFEST_NAME)
+
     def _load_cloned_speakers(self):
-        """启动时从磁盘加载已持久化的克隆音色。"""
+        """启动时读取克隆音色清单，SE 文件延迟到首次使用时再加载。
+
+        清单之外的 SE 文件（旧版本目录，或保存 SE 后、写清单前进程退出）在同一次目录扫描中补登，
+        只列目录、不逐个打开 SE 文件；有补登时重写清单。
+        """
         if not os.path.isdir(self.clone_data_dir):
             return
-        for fname in os.listdir(self.clone_data_dir):
-            if fname.endswith(".pth"):
-                speaker_id = fname[:-4]
-                meta_path = os.path.join(self.clone_data_dir, f"{speaker_id}.json")
-                se_path = os.path.join(self.clone_data_dir, fname)
+        manifest_path = self._manifest_path()
+        if os.path.isfile(manifest_path):
+            try:
+                with open(manifest_path, "rb") as f:
+                    manifest = json.loads(f.read())
+                entries = {
+                    speaker_id: {
+                        "se": None,
+                        "lang": entry.get("lang", "ZH"),
+                        "path": os.path.join(self.clone_data_dir, entry["path"]),
+                    }
+                    for speaker_id, entry in manifest.items()
+                }
+            except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+                logger.warning("读取克隆音色清单失败，改为扫描目录: %s", e)
+            else:
+                self.cloned_speakers.update(entries)
+                logger.info("已从清单登记 %d 个克隆音色", len(entries))
+
+        # <id>.safetensors 优先于旧版 <id>.pth
+        se_files = {}
+        for fname in sorted(os.listdir(self.clone_data_dir), key=lambda n: n.endswith(".safetensors")):
+            speaker_id, ext = os.path.splitext(fname)
+            if ext in (".safetensors", ".pth") and speaker_id not in self.cloned_speakers:
+                se_files[speaker_id] = fname
+        for speaker_id, fname in se_files.items():
+            lang = "ZH"  # 默认语言
+            meta_path = os.path.join(self.clone_data_dir, f"{speaker_id}.json")
+            if os.path.isfile(meta_path):
                 try:
-                    se = torch.load(se_path, map_location=self.device)
-                    lang = "ZH"  # 默认语言
-                    if os.path.isfile(meta_path):
-                        with open(meta_path, "r") as f:
-                            meta = json.load(f)
-                            lang = meta.get("lang", "ZH")
-                    self.cloned_speakers[speaker_id] = {"se": se, "lang": lang}
-                    logger.info("已加载克隆音色: %s (lang=%s)", speaker_id, lang)
-                except Exception as e:
-                    logger.warning("加载克隆音色失败 %s: %s", fname, e)
+                    with open(meta_path, "r") as f:
+                        lang = json.load(f).get("lang", "ZH")
+                except (OSError, ValueError, AttributeError) as e:
+                    logger.warning("读取克隆音色元数据失败 %s: %s", meta_path, e)
+            self.cloned_speakers[speaker_id] = {
+                "se": None, "lang": lang, "path": os.path.join(self.clone_data_dir, fname),
+            }
+            logger.info("补登清单外的克隆音色: %s (lang=%s)", speaker_id, lang)
+        if se_files:
+            self._write_manifest()
+
+    def _get_clone_se(self, speaker_id: str) -> torch.Tensor:
+        """返回克隆音色的 SE（位于 self.device），首次调用时从磁盘读取。"""
+        info = self.cloned_speakers[speaker_id]
+        se = info["se"]
+        if se is None:
+            with self._clone_se_lock:
+                se = info["se"]
+                if se is None:
+                    se = info["se"] = self._read_se(info["path"])
+        return se
+
+    def _read_se(self, se_path: str) -> torch.Tensor:
+        """读取 SE 文件并放到 self.device 上；safetensors 无需经过 pickle。"""
+        if se_path.endswith(".safetensors"):
+            se = safetensors.torch.load_file(se_path)["se"]
+        else:
+            # 旧版 torch.save 文件：weights_only 禁止反序列化任意对象
+            se = torch.load(se_path, map_location="cpu", weights_only=True)
+        return se.to(self.device).contiguous()
+
+    def _write_manifest(self):
+        """将当前克隆音色清单原子写入磁盘（先写临时文件再 rename）。"""
+        with self._manifest_lock:
+            manifest = {
+                speaker_id: {"lang": info["lang"], "path": os.path.basename(info["path"])}
+                for speaker_id, info in list(self.cloned_speakers.items())
+            }
+            manifest_path = self._manifest_path()
+            tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(json_dumps(manifest))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, manifest_path)
 
     def _save_cloned_speaker(self, speaker_id: str, se, lang: str):
-        """将克隆音色持久化到磁盘。"""
-        se_path = os.path.join(self.clone_data_dir, f"{speaker_id}.pth")
-        meta_path = os.path.join(self.clone_data_dir, f"{speaker_id}.json")
-        torch.save(se.cpu(), se_path)
-        with open(meta_path, "w") as f:
-            json.dump({"lang": lang}, f)
+        """写入克隆音色的 SE 文件，登记到 cloned_speakers 并原子更新清单。
+
+        先写 SE 再写清单：两步之间进程退出时，SE 文件会在下次启动时由 _load_cloned_speakers 补登。
+        """
+        se_path = os.path.join(self.clone_data_dir, f"{speaker_id}.safetensors")
+        safetensors.torch.save_file({"se": se.detach().cpu().contiguous()}, se_path)
+        with self._payload_lock:
+            self.cloned_speakers[speaker_id] = {"se": se, "lang": lang, "path": se_path}
+            # 说话人列表已变化，下次请求时重新序列化
+            self._speakers_bytes = None
+        self._write_manifest()
 
     # ------------------------------------------------------------------
     # 获取 source SE（MeloTTS base speaker 的音色向量）
     # ------------------------------------------------------------------
     def _get_source_se(self, lang: str):
-        """获取 MeloTTS 对应语言的 base speaker SE。"""
+        """获取 MeloTTS 对应语言的 base speaker SE（启动时预加载）。"""
+        se = self._source_se_cache.get(lang)
+        if se is not None:
+            return se
         se_filename = LANG_SE_MAP.get(lang)
         if se_filename is None:
             raise ValueError(f"未找到语言 {lang} 对应的 source SE 映射")
-        se_path = os.path.join(self.base_se_dir, se_filename)
-        if not os.path.isfile(se_path):
-            raise FileNotFoundError(f"Source SE 文件不存在: {se_path}")
-        return torch.load(se_path, map_location=self.device)
+        raise FileNotFoundError(f"Source SE 文件不存在: {os.path.join(self.base_se_dir, se_filename)}")
+
+    # ------------------------------------------------------------------
+    # 音高变换
+    # ------------------------------------------------------------------
+    def _pitch_shift(self, audio_t: torch.Tensor, semitones: float, n_fft: int = 2048) -> torch.Tensor:
+        """相位声码器时间伸缩后重采样回原长度，与 librosa.effects.pitch_shift 的两步相同。
+
+        torchaudio PitchShift 按 int(sr / rate) -> sr 重采样，两者最大公约数通常很小，
+        滤波器核可达数 GB；这里把伸缩比近似为分母不超过 PITCH_RATE_MAX_DENOMINATOR 的分数 p/q，
+        按 q -> p 重采样，核大小与采样率无关。半音按 0.1 取整。
+        """
+        steps = int(round(semitones * 10))
+        if steps == 0:
+            return audio_t
+        ratio = Fraction(2.0 ** (-steps / 120.0)).limit_denominator(PITCH_RATE_MAX_DENOMINATOR)
+        rate = float(ratio)
+        hop = n_fft // 4
+        buffers = self._pitch_stft_buffers.get(n_fft)
+        if buffers is None:
+            window = torch.hann_window(n_fft, device=self.device)
+            phase_advance = torch.linspace(0, math.pi * hop, n_fft // 2 + 1, device=self.device)[..., None]
+            buffers = self._pitch_stft_buffers.setdefault(n_fft, (window, phase_advance))
+        window, phase_advance = buffers
+
+        length = audio_t.shape[-1]
+        spec = torch.stft(audio_t, n_fft, hop_length=hop, window=window, return_complex=True)
+        spec = torchaudio.functional.phase_vocoder(spec, rate, phase_advance)
+        stretched = torch.istft(spec, n_fft, hop_length=hop, window=window, length=int(round(length / rate)))
+        # 伸缩后的信号视作采样率 sr / rate，重采样回 sr：比例为 1 : rate = q : p
+        shifted = self._get_resampler(ratio.denominator, ratio.numerator)(stretched)
+        if shifted.shape[-1] >= length:
+            return shifted[..., :length]
+        return torch.nn.functional.pad(shifted, (0, length - shifted.shape[-1]))
+
+    def _get_resampler(self, orig_sr: int, new_sr: int) -> torch.nn.Module:
+        """获取 orig_sr -> new_sr 的 Resample，滤波器核按采样率对缓存复用（LRU，最多 RESAMPLER_CACHE_SIZE 个）。"""
+        key = (orig_sr, new_sr)
+        with self._resamplers_lock:
+            resampler = self._resamplers.get(key)
+            if resampler is not None:
+                self._resamplers.move_to_end(key)
+                return resampler
+        # 参数对应 librosa 默认的 kaiser_best
+        resampler = torchaudio.transforms.Resample(
+            orig_sr, new_sr,
+            lowpass_filter_width=64, rolloff=0.9475937167399596,
+            resampling_method="sinc_interp_kaiser", beta=14.769656459379492,
+        ).to(self.device)
+        with self._resamplers_lock:
+            resampler = self._resamplers.setdefault(key, resampler)
+            self._resamplers.move_to_end(key)
+            while len(self._resamplers) > RESAMPLER_CACHE_SIZE:
+                self._resamplers.popitem(last=False)
+        return resampler
 
     # ------------------------------------------------------------------
     # 声音克隆：从参考音频提取 SE
     # ------------------------------------------------------------------
+    @torch.inference_mode()
     def voice_clone(self, audio_path: str, lang: str = "ZH") -> str:
         """
         从参考音频提取音色向量并注册为新说话人。
@@ -260,42 +685,107 @@ class TTSEngine:
 
         # 使用 ToneColorConverter 的 extract_se 方法直接从音频提取
         # 不走 se_extractor.get_se (避免 whisper/VAD 依赖)
-        se = self.tone_color_converter.extract_se([audio_path])
+        with self._converter_lock:
+            se = self.tone_color_converter.extract_se([audio_path])
 
-        self.cloned_speakers[speaker_id] = {"se": se, "lang": lang}
         self._save_cloned_speaker(speaker_id, se, lang)
         logger.info("已注册克隆音色: %s", speaker_id)
         return speaker_id
 
+    def _melo_tts(self, lang: str, model, text: str, melo_spk_id: int, speed: float, return_tensor: bool = False):
+        """执行 MeloTTS 合成，返回 float32 音频（return_tensor 时为 self.device 上的张量）。
+
+        只有声学模型推理在该语言模型的锁内执行；文本前端与 BERT 在锁外，
+        多个工作线程的句子才能在 BERT 分桶批处理中合并。
+        """
+        return model.tts_to_file(
+            text,
+            melo_spk_id,
+            output_path=None,
+            speed=speed,
+            quiet=True,
+            return_tensor=return_tensor,
+            infer_lock=self._model_locks[lang],
+        )
+
     # ------------------------------------------------------------------
-    # 核心 TTS
+    # 克隆音色逐句流水线（CUDA）
     # ------------------------------------------------------------------
-    def synthesize(
-        self,
-        text: str,
-        speaker_id: str = None,
-        speed_ratio: float = 50.0,
-        volume_ratio: float = 50.0,
-        pitch_ratio: float = 50.0,
-        sample_rate: int = 16000,
-        channels: int = 1,
-        output_format: str = "pcm",
-    ) -> bytes:
-        """
-        合成语音，返回音频字节流。
+    def _tts_convert_pipelined(self, model, sentences, melo_spk_id, speed, lang, speaker_id):
+        """主线程在 _gen_stream 上生成第 i+1 句的同时，转换线程在 _conv_stream 上转换第 i 句。
+
+        句子音频全程留在 self.device 上，两条流之间用 CUDA Event 同步，不经过 CPU。
+        返回 (audio_t, sr, converted)，张量位于 self.device 且可在当前流上使用；失败时 converted 为 False，
+        audio_t 为未转换的 MeloTTS 音频，由调用方按非流水线路径重新转换。
         """
-        logger.info(f"开始合成: text='{text[:20]}...', speaker_id={speaker_id}")
-        
-        # ----------------------------------------------------------
-        # 1. 确定说话人及对应模型
-        # ----------------------------------------------------------
-        is_cloned = False
-        lang = None
-        melo_spk_id = None
+        model_sr = model.hps.data.sampling_rate
+        converter = self.tone_color_converter
+        try:
+            source_se = self._get_source_se(lang)
+            target_se = self._get_clone_se(speaker_id)
+        except Exception as e:
+            logger.error("音色转换准备失败: %s", e)
+            source_se = target_se = None
+
+        def convert(audio_t, ready):
+            with torch.inference_mode(), torch.cuda.stream(self._conv_stream):
+                # 等待 _gen_stream 上该句生成完成；张量由 _gen_stream 分配，需登记到 _conv_stream 防止提前复用
+                self._conv_stream.wait_event(ready)
+                audio_t.record_stream(self._conv_stream)
+                # 水印在拼接后对整段添加一次；逐句添加会让短句因不足水印长度而漏加
+                with self._converter_lock:
+                    out = converter.convert_from_waveform(
+                        audio_t, model_sr, source_se, target_se, watermark=False,
+                    )
+                done = torch.cuda.Event()
+                done.record(self._conv_stream)
+            return out, done
+
+        raw_pieces, futures = [], []
+        with torch.cuda.stream(self._gen_stream):
+            for sentence in sentences:
+                audio_t = self._melo_tts(lang, model, sentence, melo_spk_id, speed, return_tensor=True)
+                raw_pieces.append(audio_t)
+                if source_se is not None:
+                    ready = torch.cuda.Event()
+                    ready.record(self._gen_stream)
+                    futures.append(self._conv_executor.submit(convert, audio_t, ready))
+
+        current = torch.cuda.current_stream(self.device)
+        current.wait_stream(self._gen_stream)
+        for piece in raw_pieces:
+            piece.record_stream(current)
+        raw_audio = torch.cat(raw_pieces)
+        if source_se is None:
+            return raw_audio, model_sr, False
 
+        try:
+            outs = []
+            for future in futures:
+                out, done = future.result()
+                current.wait_event(done)
+                out.record_stream(current)
+                outs.append(out)
+            # 只有开头的水印范围拷回 CPU 加水印，其余部分留在设备上
+            watermarker = StreamWatermarker(converter, WATERMARK_MESSAGE, self._converter_lock)
+            pieces = []
+            for out in outs:
+                pieces.extend(watermarker.push(out))
+            pieces.extend(watermarker.flush())
+            audio_t = torch.cat(pieces)
+        except Exception as e:
+            logger.error("流水线音色转换失败: %s", e)
+            return raw_audio, model_sr, False
+        logger.info("音色转换完成")
+        return audio_t, converter.hps.data.sampling_rate, True
+
+    # ------------------------------------------------------------------
+    # 核心 TTS
+    # ------------------------------------------------------------------
+    def _resolve_speaker(self, speaker_id: str):
+        """确定说话人及对应模型，返回 (is_cloned, lang, model, melo_spk_id)。"""
         if speaker_id and speaker_id in self.cloned_speakers:
             # 克隆音色
-            is_cloned = True
             clone_info = self.cloned_speakers[speaker_id]
             lang = clone_info["lang"]
             logger.info(f"使用克隆音色: {speaker_id}, lang={lang}")
@@ -303,10 +793,10 @@ class TTSEngine:
             model = self.melo_models.get(lang)
             if model is None:
                 raise ValueError(f"克隆音色对应的语言模型未加载: {lang}")
-            # 使用默认 speaker ID
-            spk2id = model.hps.data.spk2id
-            melo_spk_id = list(spk2id.values())[0]  # 取第一个（通常只有一个）
-        elif speaker_id and speaker_id in self.builtin_speakers:
+            # 使用默认 speaker ID（第一个，通常只有一个）
+            melo_spk_id = self._default_spk_id_for_lang[lang]
+            return True, lang, model, melo_spk_id
+        if speaker_id and speaker_id in self.builtin_speakers:
             # 预设音色
             info = self.builtin_speakers[speaker_id]
             lang = info["lang"]
@@ -315,19 +805,19 @@ class TTSEngine:
             model = self.melo_models.get(lang)
             if model is None:
                 raise ValueError(f"预设音色对应的语言模型未加载: {lang}")
-        else:
-            # 未指定或无效 speaker_id，使用第一个加载的模型和默认说话人
-            if speaker_id:
-                logger.warning("未知 speaker_id: %s，使用默认说话人", speaker_id)
-            lang = list(self.melo_models.keys())[0]
-            model = self.melo_models[lang]
-            spk2id = model.hps.data.spk2id
-            melo_spk_id = list(spk2id.values())[0]
-            logger.info(f"使用默认音色: lang={lang}, spk_id={melo_spk_id}")
-
-        # ----------------------------------------------------------
-        # 2. 参数转换
-        # ----------------------------------------------------------
+            return False, lang, model, melo_spk_id
+        # 未指定或无效 speaker_id，使用第一个加载的模型和默认说话人
+        if speaker_id:
+            logger.warning("未知 speaker_id: %s，使用默认说话人", speaker_id)
+        lang = self._default_lang
+        model = self.melo_models[lang]
+        melo_spk_id = self._default_spk_id_for_lang[lang]
+        logger.info(f"使用默认音色: lang={lang}, spk_id={melo_spk_id}")
+        return False, lang, model, melo_spk_id
+
+    @staticmethod
+    def _convert_params(speed_ratio: float, volume_ratio: float, pitch_ratio: float):
+        """0-100 的请求参数转换为 (倍速, 音量倍数, 半音偏移)。"""
         # speed_ratio: 0-100 -> 实际倍速 (50 = 1.0x, 0 = 0.5x, 100 = 2.0x)
         speed = 0.5 + (speed_ratio / 100.0) * 1.5
         speed = max(0.1, min(3.0, speed))
@@ -339,79 +829,66 @@ class TTSEngine:
         # pitch_ratio: 0-100 -> 半音偏移 (50 = 0, 每单位约 0.24 半音)
         pitch_shift_semitones = (pitch_ratio - 50.0) * 0.24
         logger.info(f"参数: speed={speed:.2f}, volume={volume_scale:.2f}, pitch_shift={pitch_shift_semitones:.2f}半音")
+        return speed, volume_scale, pitch_shift_semitones
 
-        # ----------------------------------------------------------
-        # 3. MeloTTS 合成
-        # ----------------------------------------------------------
-        logger.info("开始 MeloTTS 合成...")
-        audio_np = model.tts_to_file(
-            text,
-            melo_spk_id,
-            output_path=None,
-            speed=speed,
-            quiet=True,
-        )
-        model_sr = model.hps.data.sampling_rate  # MeloTTS 原始采样率
-        logger.info(f"MeloTTS 合成完成，采样率={model_sr}, 音频长度={len(audio_np)}")
-
-        # ----------------------------------------------------------
-        # 4. 音色转换（仅克隆音色需要）
-        # ----------------------------------------------------------
-        if is_cloned:
-            logger.info("开始音色转换...")
-            try:
-                source_se = self._get_source_se(lang)
-                target_se = self.cloned_speakers[speaker_id]["se"]
-
-                # 写入临时文件（ToneColorConverter.convert 需要文件路径）
-                with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp_src:
-                    sf.write(tmp_src.name, audio_np, model_sr)
-                    tmp_src_path = tmp_src.name
-
-                with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp_out:
-                    tmp_out_path = tmp_out.name
-
-                self.tone_color_converter.convert(
-                    audio_src_path=tmp_src_path,
-                    src_se=source_se,
-                    tgt_se=target_se,
-                    output_path=tmp_out_path,
-                    message="@MyShell",
-                )
-
-                audio_np, model_sr = sf.read(tmp_out_path)
-                audio_np = audio_np.astype(np.float32)
+    def _convert_clone(self, audio_t: torch.Tensor, model_sr: int, lang: str, speaker_id: str, watermark: bool = True):
+        """将 MeloTTS 音频转换为克隆音色，返回 (audio_t, sr)，张量位于 self.device；失败时返回原始音频。
 
-                # 清理临时文件
-                os.unlink(tmp_src_path)
-                os.unlink(tmp_out_path)
-                logger.info("音色转换完成")
+        逐句转换后再拼接的调用方应传 watermark=False，对整段只加一次水印（见 StreamWatermarker）。
+        """
+        logger.info("开始音色转换...")
+        try:
+            source_se = self._get_source_se(lang)
+            target_se = self._get_clone_se(speaker_id)
 
-            except Exception as e:
-                logger.error("音色转换失败，返回原始音频: %s", e)
+            # 直接在内存中转换，不经临时 WAV 文件
+            with self._converter_lock:
+                converted = self.tone_color_converter.convert_from_waveform(
+                    audio_t, model_sr, source_se, target_se, message=WATERMARK_MESSAGE, watermark=watermark,
+                )
+            logger.info("音色转换完成")
+            return converted, self.tone_color_converter.hps.data.sampling_rate
+        except Exception as e:
+            logger.error("音色转换失败，返回原始音频: %s", e)
+            return audio_t, model_sr
 
-        # ----------------------------------------------------------
-        # 5. 音频后处理
-        # ----------------------------------------------------------
-        logger.info("开始音频后处理...")
-        
-        # 音量调整
-        if abs(volume_scale - 1.0) > 0.01:
-            logger.info(f"调整音量: {volume_scale:.2f}x")
-            audio_np = audio_np * volume_scale
-            audio_np = np.clip(audio_np, -1.0, 1.0)
+    def _audio_cache_get(self, key):
+        """命中时返回 (audio_t, sr) 并移到队尾，未命中返回 None。
 
-        # 音高调整（使用 librosa pitch shift）
-        # 注意：pitch_shift 在某些环境下可能很慢，建议阈值设置大一些
+        后处理与编码都不会原地修改输入，缓存张量直接共享给各请求，调用方不得原地改写。
+        """
+        if not self._audio_cache_size:
+            return None
+        with self._audio_cache_lock:
+            entry = self._audio_cache.get(key)
+            if entry is None:
+                return None
+            self._audio_cache.move_to_end(key)
+        return entry
+
+    def _audio_cache_put(self, key, audio_t: torch.Tensor, sr: int):
+        nbytes = audio_t.numel() * audio_t.element_size()
+        # 单条超过字节上限时不缓存，避免挤掉所有其它条目
+        if not self._audio_cache_size or nbytes > self._audio_cache_max_bytes:
+            return
+        with self._audio_cache_lock:
+            old = self._audio_cache.pop(key, None)
+            if old is not None:
+                self._audio_cache_bytes -= old[0].numel() * old[0].element_size()
+            self._audio_cache[key] = (audio_t, sr)
+            self._audio_cache_bytes += nbytes
+            while (len(self._audio_cache) > self._audio_cache_size
+                   or self._audio_cache_bytes > self._audio_cache_max_bytes):
+                evicted, _ = self._audio_cache.popitem(last=False)[1]
+                self._audio_cache_bytes -= evicted.numel() * evicted.element_size()
+
+    def _post_process(self, audio_t: torch.Tensor, model_sr: int, pitch_shift_semitones: float, sample_rate: int):
+        """音高与采样率处理，输入输出均为 self.device 上的单声道张量。音量与双声道在编码时处理。"""
+        # 音高调整（在 self.device 上执行 STFT / 相位声码器 / 重采样）
         if abs(pitch_shift_semitones) > 0.5:
             logger.info(f"调整音高: {pitch_shift_semitones:.2f} 半音...")
             try:
-                import warnings
-                with warnings.catch_warnings():
-                    warnings.simplefilter("ignore")
-                    audio_np = librosa.effects.pitch_shift(
-                        y=audio_np, sr=model_sr, n_steps=pitch_shift_semitones
-                    )
+                audio_t = self._pitch_shift(audio_t, pitch_shift_semitones)
                 logger.info("音高调整完成")
             except Exception as e:
                 logger.warning("音高调整失败: %s", e)
@@ -421,30 +898,170 @@ class TTSEngine:
         # 采样率转换
         if sample_rate != model_sr:
             logger.info(f"转换采样率: {model_sr} -> {sample_rate}")
-            audio_np = librosa.resample(audio_np, orig_sr=model_sr, target_sr=sample_rate)
+            resampler = self._get_resampler(model_sr, sample_rate)
+            audio_t = resampler(audio_t)
+        return audio_t
 
-        # 声道处理
+    def _encode_pcm(self, audio_t: torch.Tensor, channels: int = 1, volume_scale: float = 1.0) -> np.ndarray:
+        """单声道 float 音频编码为交织的 PCM 16-bit 数组。
+
+        音量倍数并入 32767 缩放系数，缩放、限幅与 int16 转换都在 self.device 上完成，
+        只把最终的 int16 数据拷回 CPU 一次；双声道在设备上展开为交织的两列。
+        """
+        if abs(volume_scale - 1.0) > 0.01:
+            logger.info(f"调整音量: {volume_scale:.2f}x")
+        else:
+            volume_scale = 1.0
+        # 先限幅再转换，避免越界回绕；mul 生成新张量，不改写调用方（如缓存）的输入
+        pcm = audio_t.mul(32767.0 * volume_scale).clamp_(-32768, 32767).to(torch.int16)
         if channels == 2:
-            logger.info("转换为双声道")
-            audio_np = np.stack([audio_np, audio_np], axis=-1)
+            # L/R 交织：[l0, r0, l1, r1, ...]
+            pcm = pcm.unsqueeze(-1).expand(-1, 2).reshape(-1)
+        return pcm.cpu().numpy()
+
+    @torch.inference_mode()
+    def synthesize(
+        self,
+        text: str,
+        speaker_id: str = None,
+        speed_ratio: float = 50.0,
+        volume_ratio: float = 50.0,
+        pitch_ratio: float = 50.0,
+        sample_rate: int = 16000,
+        channels: int = 1,
+        output_format: str = "pcm",
+    ) -> bytes:
+        """
+        合成语音，返回音频字节流。
+        """
+        logger.info(f"开始合成: text='{text[:20]}...', speaker_id={speaker_id}")
+        
+        # ----------------------------------------------------------
+        # 1. 确定说话人及对应模型
+        # ----------------------------------------------------------
+        is_cloned, lang, model, melo_spk_id = self._resolve_speaker(speaker_id)
+
+        # ----------------------------------------------------------
+        # 2. 参数转换
+        # ----------------------------------------------------------
+        speed, volume_scale, pitch_shift_semitones = self._convert_params(speed_ratio, volume_ratio, pitch_ratio)
+
+        # ----------------------------------------------------------
+        # 3. MeloTTS 合成（命中缓存时连同第 4 步一起跳过）
+        # ----------------------------------------------------------
+        cache_key = (
+            hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest(),
+            melo_spk_id, round(speed, 2), lang, speaker_id if is_cloned else None,
+        )
+        cached = self._audio_cache_get(cache_key)
+        if cached is not None:
+            audio_t, model_sr = cached
+            logger.info(f"命中合成缓存，采样率={model_sr}, 音频长度={audio_t.numel()}")
+        else:
+            audio_t, model_sr = self._generate(text, is_cloned, lang, model, melo_spk_id, speed, speaker_id)
+            # 音色转换失败时返回的是未转换音频（采样率仍为 MeloTTS 的），不写入缓存
+            if not is_cloned or model_sr == self.tone_color_converter.hps.data.sampling_rate:
+                self._audio_cache_put(cache_key, audio_t, model_sr)
+
+        # ----------------------------------------------------------
+        # 5. 音频后处理（张量始终位于 self.device，编码时才拷回 CPU）
+        # ----------------------------------------------------------
+        logger.info("开始音频后处理...")
+        audio_t = self._post_process(audio_t, model_sr, pitch_shift_semitones, sample_rate)
 
         # ----------------------------------------------------------
         # 6. 编码输出
         # ----------------------------------------------------------
-        logger.info(f"编码输出格式: {output_format}")
+        logger.info(f"编码输出格式: {output_format}, 声道数: {channels}")
+        pcm = self._encode_pcm(audio_t, channels, volume_scale)
         if output_format == "wav":
             buf = io.BytesIO()
-            sf.write(buf, audio_np, sample_rate, format="WAV", subtype="PCM_16")
+            sf.write(buf, pcm.reshape(-1, channels), sample_rate, format="WAV", subtype="PCM_16")
             result = buf.getvalue()
             logger.info(f"WAV 编码完成，大小: {len(result)} 字节")
             return result
         else:
-            # PCM 16-bit
-            pcm_data = (audio_np * 32767).astype(np.int16)
-            result = pcm_data.tobytes()
+            result = pcm.tobytes()
             logger.info(f"PCM 编码完成，大小: {len(result)} 字节")
             return result
 
+    def _generate(self, text, is_cloned, lang, model, melo_spk_id, speed, speaker_id):
+        """执行 MeloTTS 合成与（克隆音色的）音色转换，返回 (audio_t, sr)，张量位于 self.device。"""
+        logger.info("开始 MeloTTS 合成...")
+        model_sr = model.hps.data.sampling_rate  # MeloTTS 原始采样率
+        audio_t = None
+        converted = False
+        if is_cloned and self._gen_stream is not None:
+            sentences = model.split_sentences_into_pieces(text, model.language, quiet=True)
+            if len(sentences) > 1:
+                # 多句克隆音色：逐句生成与音色转换流水线执行（合并了第 4 步）
+                logger.info(f"逐句流水线合成与音色转换: {len(sentences)} 句")
+                audio_t, model_sr, converted = self._tts_convert_pipelined(
+                    model, sentences, melo_spk_id, speed, lang, speaker_id,
+                )
+                # 转换失败时 audio_t 为已生成的 MeloTTS 音频，直接交给下方的整段转换，不重新合成
+        if audio_t is None:
+            audio_t = self._melo_tts(lang, model, text, melo_spk_id, speed, return_tensor=True)
+        logger.info(f"MeloTTS 合成完成，采样率={model_sr}, 音频长度={audio_t.numel()}")
+
+        # ----------------------------------------------------------
+        # 4. 音色转换（仅克隆音色需要）
+        # ----------------------------------------------------------
+        if is_cloned and not converted:
+            audio_t, model_sr = self._convert_clone(audio_t, model_sr, lang, speaker_id)
+        return audio_t, model_sr
+
+    def synthesize_stream(
+        self,
+        text: str,
+        speaker_id: str = None,
+        speed_ratio: float = 50.0,
+        volume_ratio: float = 50.0,
+        pitch_ratio: float = 50.0,
+        sample_rate: int = 16000,
+        channels: int = 1,
+        chunk_samples: int = STREAM_CHUNK_SAMPLES,
+    ):
+        """
+        逐句合成并产出 PCM 16-bit 字节块，每块 chunk_samples 个采样点（末块可能更短）。
+        每句独立完成 MeloTTS → 音色转换 → 后处理 → 编码，首块在第一句完成后即可发送。
+        克隆音色的水印作用于整段开头约 2 秒：这部分音频凑齐（或合成结束）后才一并输出。
+        """
+        logger.info(f"开始流式合成: text='{text[:20]}...', speaker_id={speaker_id}")
+        is_cloned, lang, model, melo_spk_id = self._resolve_speaker(speaker_id)
+        speed, volume_scale, pitch_shift_semitones = self._convert_params(speed_ratio, volume_ratio, pitch_ratio)
+        converter_sr = self.tone_color_converter.hps.data.sampling_rate
+        watermarker = StreamWatermarker(self.tone_color_converter, WATERMARK_MESSAGE, self._converter_lock)
+
+        def encode(pieces):
+            pcm = b""
+            with torch.inference_mode():
+                for audio_t, sr in pieces:
+                    audio_t = self._post_process(audio_t, sr, pitch_shift_semitones, sample_rate)
+                    pcm += self._encode_pcm(audio_t, channels, volume_scale).tobytes()
+            return pcm
+
+        rechunker = AudioRechunker(chunk_samples * 2 * channels)
+        sentences = model.split_sentences_into_pieces(text, model.language, quiet=True)
+        for i, sentence in enumerate(sentences):
+            with torch.inference_mode():
+                audio_t = self._melo_tts(lang, model, sentence, melo_spk_id, speed, return_tensor=True)
+                model_sr = model.hps.data.sampling_rate
+                if not is_cloned:
+                    pieces = [(audio_t, model_sr)]
+                else:
+                    converted, sr = self._convert_clone(audio_t, model_sr, lang, speaker_id, watermark=False)
+                    if sr == converter_sr:
+                        pieces = [(t, converter_sr) for t in watermarker.push(converted)]
+                    else:
+                        # 本句转换失败：先放行已暂存的音频，本句按原始音频输出
+                        pieces = [(t, converter_sr) for t in watermarker.flush()] + [(converted, sr)]
+            pcm = encode(pieces)
+            logger.info(f"第 {i + 1}/{len(sentences)} 句合成完成，PCM {len(pcm)} 字节")
+            yield from rechunker.push(pcm)
+        yield from rechunker.push(encode([(t, converter_sr) for t in watermarker.flush()]))
+        yield from rechunker.flush()
+
 
 # ============================================================================
 # Tornado Request Handlers
@@ -453,10 +1070,13 @@ class TTSEngine:
 def json_response(handler: tornado.web.RequestHandler, code: int, message: str, data: dict = None):
     """统一 JSON 响应格式。"""
     handler.set_header("Content-Type", "application/json; charset=utf-8")
-    body = {"code": code, "message": message}
-    if data is not None:
-        body["data"] = data
-    handler.write(json.dumps(body, ensure_ascii=False))
+    handler.write(json_body(code, message, data))
+
+
+def json_bytes_response(handler: tornado.web.RequestHandler, body: bytes):
+    """发送已序列化的 JSON 响应体。"""
+    handler.set_header("Content-Type", "application/json; charset=utf-8")
+    handler.write(body)
 
 
 def parse_request_params(handler: tornado.web.RequestHandler) -> dict:
@@ -487,17 +1107,17 @@ class HealthHandler(tornado.web.RequestHandler):
         engine: TTSEngine = self.application.engine
         status = "healthy" if engine and engine.melo_models else "degraded"
         self.set_header("Content-Type", "application/json; charset=utf-8")
-        self.write(json.dumps({
+        self.write(json_dumps({
             "status": status,
             "service": SERVICE_NAME,
             "version": SERVICE_VERSION,
-        }, ensure_ascii=False))
+        }))
 
 
 class TTSHandler(tornado.web.RequestHandler):
     """POST /ticos/tts"""
 
-    def post(self):
+    async def post(self):
         logger.info("收到 TTS 请求")
         engine: TTSEngine = self.application.engine
         if not engine:
@@ -521,6 +1141,7 @@ class TTSHandler(tornado.web.RequestHandler):
         sample_rate = int(params.get("sample_rate", 16000))
         channels_val = int(params.get("channels", 1))
         output_format = params.get("format", "pcm").lower()
+        stream = str(params.get("stream", "false")).lower() in ("1", "true", "yes")
 
         # 参数边界检查
         volume_ratio = max(0, min(100, volume_ratio))
@@ -529,10 +1150,17 @@ class TTSHandler(tornado.web.RequestHandler):
         channels_val = 1 if channels_val not in (1, 2) else channels_val
         if output_format not in ("pcm", "wav"):
             output_format = "pcm"
+        if sample_rate not in SUPPORTED_SAMPLE_RATES:
+            self.set_status(400)
+            json_response(
+                self, 400,
+                f"参数错误：sample_rate 仅支持 {', '.join(str(sr) for sr in SUPPORTED_SAMPLE_RATES)}", {},
+            )
+            return
 
-        logger.info(f"开始合成语音，参数: speaker_id={speaker_id}, pitch={pitch_ratio}")
-        try:
-            audio_bytes = engine.synthesize(
+        if stream and output_format == "pcm":
+            await self._stream_pcm(
+                engine,
                 text=text,
                 speaker_id=speaker_id,
                 speed_ratio=speed_ratio,
@@ -540,7 +1168,25 @@ class TTSHandler(tornado.web.RequestHandler):
                 pitch_ratio=pitch_ratio,
                 sample_rate=sample_rate,
                 channels=channels_val,
-                output_format=output_format,
+            )
+            return
+
+        logger.info(f"开始合成语音，参数: speaker_id={speaker_id}, pitch={pitch_ratio}")
+        try:
+            # 在工作线程中合成，IOLoop 保持响应其他请求
+            audio_bytes = await tornado.ioloop.IOLoop.current().run_in_executor(
+                self.application.executor,
+                functools.partial(
+                    engine.synthesize,
+                    text=text,
+                    speaker_id=speaker_id,
+                    speed_ratio=speed_ratio,
+                    volume_ratio=volume_ratio,
+                    pitch_ratio=pitch_ratio,
+                    sample_rate=sample_rate,
+                    channels=channels_val,
+                    output_format=output_format,
+                ),
             )
             logger.info(f"合成完成，音频大小: {len(audio_bytes)} 字节")
         except Exception as e:
@@ -559,54 +1205,172 @@ class TTSHandler(tornado.web.RequestHandler):
         self.write(audio_bytes)
         logger.info("响应已发送")
 
+    async def _stream_pcm(self, engine: "TTSEngine", **kwargs):
+        """逐句合成并以 chunked 方式发送 PCM，首块在第一句完成后即发出。"""
+        chunks = engine.synthesize_stream(**kwargs)
+        loop = tornado.ioloop.IOLoop.current()
+        executor = self.application.executor
+
+        def next_chunk():
+            return next(chunks, None)
+
+        try:
+            # 先取首块，合成失败时仍可返回 JSON 错误
+            first = await loop.run_in_executor(executor, next_chunk) or b""
+        except Exception as e:
+            logger.exception("TTS 流式合成失败")
+            self.set_status(500)
+            json_response(self, 500, f"合成失败: {e}", {})
+            return
+
+        self.set_header("Content-Type", "audio/pcm")
+        self.set_header("Content-Disposition", 'attachment; filename="output.pcm"')
+        total = len(first)
+        self.write(first)
+        await self.flush()
+        try:
+            # 每块都在工作线程中生成，IOLoop 只负责发送
+            while True:
+                chunk = await loop.run_in_executor(executor, next_chunk)
+                if chunk is None:
+                    break
+                self.write(chunk)
+                total += len(chunk)
+                await self.flush()
+        except tornado.iostream.StreamClosedError:
+            logger.warning("客户端已断开，停止流式合成")
+            chunks.close()
+            return
+        except Exception:
+            # 响应头已发出，只能截断连接
+            logger.exception("TTS 流式合成中途失败，已发送 %d 字节", total)
+            raise
+        logger.info("流式响应已发送，共 %d 字节", total)
 
+
+@tornado.web.stream_request_body
 class VoiceCloneHandler(tornado.web.RequestHandler):
-    """POST /ticos/voice-clone"""
+    """POST /ticos/voice-clone
+
+    请求体以流式方式接收：multipart 上传的 ref_audio 边接收边写入临时文件，
+    其余 Content-Type（JSON / urlencoded，携带 URL 或 base64）仍在内存中缓存后按原逻辑解析。
+    """
+
+    def prepare(self):
+        self._multipart = None
+        self._body_chunks = []
+        self._body_error = None
+        content_type = self.request.headers.get("Content-Type", "")
+        if "multipart/form-data" in content_type:
+            boundary = None
+            for field in content_type.split(";"):
+                key, _, value = field.strip().partition("=")
+                if key == "boundary" and value:
+                    boundary = value.strip('"')
+            if boundary:
+                self._multipart = MultipartStreamParser(boundary.encode("latin1"), tmp_dir=self.application.tmp_dir)
+            else:
+                self._body_error = "multipart 请求缺少 boundary"
+
+    def data_received(self, chunk):
+        if self._body_error:
+            return
+        if self._multipart is None:
+            self._body_chunks.append(chunk)
+            return
+        try:
+            self._multipart.feed(chunk)
+        except Exception as e:
+            self._body_error = f"multipart 解析失败: {e}"
+            self._multipart.close()
+
+    def on_finish(self):
+        self._cleanup_upload()
+
+    def on_connection_close(self):
+        self._cleanup_upload()
+
+    def _cleanup_upload(self):
+        parser = getattr(self, "_multipart", None)
+        if parser is not None:
+            parser.close()
+            if parser.file_path and os.path.isfile(parser.file_path):
+                os.unlink(parser.file_path)
+            parser.file_path = None
+
+    def _finish_body(self):
+        """非 multipart 请求：还原 request.body 并解析表单参数，供 parse_request_params 使用。"""
+        self.request.body = b"".join(self._body_chunks)
+        self._body_chunks = []
+        content_type = self.request.headers.get("Content-Type", "")
+        if "application/json" not in content_type and self.request.body:
+            tornado.httputil.parse_body_arguments(
+                content_type, self.request.body,
+                self.request.body_arguments, self.request.files, self.request.headers,
+            )
+            for key, values in self.request.body_arguments.items():
+                self.request.arguments.setdefault(key, []).extend(values)
 
-    def post(self):
+    async def post(self):
         engine: TTSEngine = self.application.engine
         if not engine:
             self.set_status(503)
             json_response(self, 503, "模型未加载")
             return
 
+        if self._body_error:
+            self.set_status(400)
+            json_response(self, 400, f"参数错误：{self._body_error}")
+            return
+
         # ---------------------------------------------------------------
         # 解析 ref_audio
         # ---------------------------------------------------------------
-        ref_audio_data = None
-        content_type = self.request.headers.get("Content-Type", "")
+        tmp_audio_path = None
+        ref_audio_str = ""
 
-        if "multipart/form-data" in content_type:
-            # form-data 上传文件
-            files = self.request.files.get("ref_audio", [])
-            if files:
-                ref_audio_data = files[0]["body"]
+        if self._multipart is not None:
+            # form-data 上传文件：已在 data_received 中写入临时文件
+            parser = self._multipart
+            try:
+                parser.finish()
+            except ValueError as e:
+                # 临时文件仍归 parser 所有，由 on_finish 清理
+                self.set_status(400)
+                json_response(self, 400, f"参数错误：{e}")
+                return
+            if parser.file_path:
+                # 路径的所有权转交给下方 finally，避免 on_finish 重复删除
+                tmp_audio_path, parser.file_path = parser.file_path, None
             else:
                 # 可能作为普通字段传入 URL 或 base64
-                params = parse_request_params(self)
-                ref_audio_str = params.get("ref_audio", "")
+                ref_audio_str = parser.fields.get("ref_audio", "")
         else:
+            self._finish_body()
             params = parse_request_params(self)
             ref_audio_str = params.get("ref_audio", "")
 
-        if ref_audio_data is None and not ref_audio_str:
+        if tmp_audio_path is None and not ref_audio_str:
             self.set_status(400)
             json_response(self, 400, "参数错误：ref_audio 不能为空")
             return
 
-        # 将 ref_audio 保存为临时文件
-        try:
-            tmp_audio_path = self._resolve_ref_audio(ref_audio_data, ref_audio_str if ref_audio_data is None else None)
-        except Exception as e:
-            self.set_status(400)
-            json_response(self, 400, f"ref_audio 解析失败: {e}")
-            return
+        # 将 URL / base64 形式的 ref_audio 保存为临时文件
+        if tmp_audio_path is None:
+            try:
+                tmp_audio_path = self._resolve_ref_audio(ref_str=ref_audio_str)
+            except Exception as e:
+                self.set_status(400)
+                json_response(self, 400, f"ref_audio 解析失败: {e}")
+                return
 
         # ---------------------------------------------------------------
         # 执行克隆
         # ---------------------------------------------------------------
         try:
-            speaker_id = engine.voice_clone(tmp_audio_path)
+            speaker_id = await tornado.ioloop.IOLoop.current().run_in_executor(
+                self.application.executor, engine.voice_clone, tmp_audio_path,
+            )
         except Exception as e:
             logger.exception("声音克隆失败")
             self.set_status(500)
@@ -614,50 +1378,54 @@ class VoiceCloneHandler(tornado.web.RequestHandler):
             return
         finally:
             # 清理临时文件
-            if os.path.isfile(tmp_audio_path):
+            try:
                 os.unlink(tmp_audio_path)
+            except FileNotFoundError:
+                pass
 
         json_response(self, 0, "成功", {"speaker_id": speaker_id})
 
-    def _resolve_ref_audio(self, raw_bytes=None, ref_str=None) -> str:
-        """将 ref_audio (bytes / URL / base64) 解析为本地临时文件路径。"""
-        suffix = ".wav"
-        if raw_bytes:
-            tmp = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
-            tmp.write(raw_bytes)
-            tmp.close()
-            return tmp.name
-
+    def _resolve_ref_audio(self, ref_str=None) -> str:
+        """将 ref_audio (URL / base64) 解析为本地临时文件路径。"""
         if ref_str:
             # base64
             if ref_str.startswith("data:"):
                 # data:audio/wav;base64,xxxx
                 _, encoded = ref_str.split(",", 1)
-                audio_bytes = base64.b64decode(encoded)
-                tmp = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
-                tmp.write(audio_bytes)
-                tmp.close()
-                return tmp.name
+                return self._write_tmp_audio(base64.b64decode(encoded), self.application.tmp_dir)
             elif ref_str.startswith(("http://", "https://")):
                 # 下载 URL
                 import urllib.request
-                tmp = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
-                urllib.request.urlretrieve(ref_str, tmp.name)
-                tmp.close()
+                with tempfile.NamedTemporaryFile(suffix=".wav", dir=self.application.tmp_dir, delete=False) as tmp:
+                    pass
+                try:
+                    urllib.request.urlretrieve(ref_str, tmp.name)
+                except BaseException:
+                    os.unlink(tmp.name)
+                    raise
                 return tmp.name
             else:
                 # 尝试作为 raw base64
                 try:
                     audio_bytes = base64.b64decode(ref_str)
-                    tmp = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
-                    tmp.write(audio_bytes)
-                    tmp.close()
-                    return tmp.name
                 except Exception:
                     raise ValueError("ref_audio 格式无法识别，支持: URL / Base64 / 文件上传")
+                return self._write_tmp_audio(audio_bytes, self.application.tmp_dir)
 
         raise ValueError("ref_audio 为空")
 
+    @staticmethod
+    def _write_tmp_audio(data: bytes, tmp_dir: str = None) -> str:
+        """写入 tmp_dir 下的临时 WAV 文件并返回路径，由调用方删除。"""
+        with tempfile.NamedTemporaryFile(suffix=".wav", dir=tmp_dir, delete=False) as tmp:
+            try:
+                tmp.write(data)
+            except BaseException:
+                tmp.close()
+                os.unlink(tmp.name)
+                raise
+        return tmp.name
+
 
 class SpeakersHandler(tornado.web.RequestHandler):
     """GET /ticos/speakers"""
@@ -669,15 +1437,7 @@ class SpeakersHandler(tornado.web.RequestHandler):
             json_response(self, 503, "模型未加载")
             return
 
-        speakers = []
-        # 预设音色
-        for sid in engine.builtin_speakers:
-            speakers.append({"speaker_id": sid, "type": "builtin"})
-        # 克隆音色
-        for sid in engine.cloned_speakers:
-            speakers.append({"speaker_id": sid, "type": "cloned"})
-
-        json_response(self, 0, "成功", {"speakers": speakers})
+        json_bytes_response(self, engine.speakers_payload())
 
 
 class CapabilitiesHandler(tornado.web.RequestHandler):
@@ -690,10 +1450,7 @@ class CapabilitiesHandler(tornado.web.RequestHandler):
             json_response(self, 503, "模型未加载")
             return
 
-        json_response(self, 0, "成功", {
-            "model_type": "openvoice_melo",
-            "features": ["tts", "voice_clone"],
-        })
+        json_bytes_response(self, engine.capabilities_payload)
 
 
 class LanguagesHandler(tornado.web.RequestHandler):
@@ -706,16 +1463,15 @@ class LanguagesHandler(tornado.web.RequestHandler):
             json_response(self, 503, "模型未加载")
             return
 
-        languages = [MELO_LANGUAGES[lang] for lang in engine.melo_models.keys()]
-        json_response(self, 0, "成功", {"languages": languages})
+        json_bytes_response(self, engine.languages_payload)
 
 
 # ============================================================================
 # Application & Main
 # ============================================================================
 
-def make_app(engine: TTSEngine) -> tornado.web.Application:
-    """创建 Tornado Application，挂载路由和引擎实例。"""
+def make_app(engine: TTSEngine, tts_workers: int = 1, tmp_dir: str = None) -> tornado.web.Application:
+    """创建 Tornado Application，挂载路由、引擎实例、合成工作线程池与参考音频临时目录。"""
     app = tornado.web.Application([
         (r"/health", HealthHandler),
         (r"/ticos/tts", TTSHandler),
@@ -725,10 +1481,18 @@ def make_app(engine: TTSEngine) -> tornado.web.Application:
         (r"/ticos/languages", LanguagesHandler),
     ])
     app.engine = engine
+    # 合成 / 克隆在线程池中执行；GPU 上通常 1 个即可，CPU 上可按核数调大
+    app.executor = ThreadPoolExecutor(max_workers=tts_workers, thread_name_prefix="tts-worker")
+    # 仅用于上传 / 下载的参考音频；None 表示系统临时目录。不修改全局 tempfile.tempdir，
+    # 以免 torch inductor 缓存等其他 tempfile 使用者也落到容量很小的 /dev/shm 上
+    app.tmp_dir = tmp_dir
     return app
 
 
 def main():
+    # cuDNN 按卷积形状自动选核：合成音频长度每次不同，每个新形状都会重新选核，默认关闭
+    torch.backends.cudnn.benchmark = os.environ.get("TTS_CUDNN_BENCHMARK", "0") == "1"
+
     parser = argparse.ArgumentParser(description="OpenVoice-Melo-TTS HTTP 服务")
     parser.add_argument(
         "--mode",
@@ -796,12 +1560,37 @@ def main():
         str(ROOT_DIR / "OpenVoice" / "checkpoints_v2" / "converter"),
     )
 
+    # 临时文件目录（上传 / 下载的参考音频）：TTS_TMPDIR 环境变量，默认优先使用 tmpfs 上的 /dev/shm
+    tmp_dir = os.environ.get("TTS_TMPDIR")
+    if not tmp_dir and os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        if shutil.disk_usage("/dev/shm").free >= REF_AUDIO_SHM_MIN_FREE:
+            tmp_dir = "/dev/shm"
+        else:
+            logger.info("/dev/shm 剩余空间不足 %d MB，参考音频使用系统临时目录", REF_AUDIO_SHM_MIN_FREE // (1024 * 1024))
+    if tmp_dir:
+        logger.info("参考音频临时文件目录: %s", tmp_dir)
+
     # 声音克隆持久化目录
     voice_clone_dir = args.voice_clone_dir or os.environ.get(
         "VOICE_CLONE_DIR",
         str(ROOT_DIR / "voice_clones"),
     )
 
+    # 合成工作线程数
+    tts_workers = max(1, int(os.environ.get("TTS_WORKERS", "1")))
+
+    # BERT 分桶批处理的最长等待时间（毫秒），0 表示关闭。
+    # 单个工作线程时每次只有一句在提取 BERT，批处理凑不成批、只会每句多等一次，默认关闭
+    bert_batch_wait_ms = float(os.environ.get("BERT_BATCH_WAIT_MS", "10" if tts_workers > 1 else "0"))
+
+    # 启动预热（默认开启）与解码器 torch.compile（默认关闭）
+    warmup = os.environ.get("TTS_WARMUP", "1") != "0"
+    compile_decoders = os.environ.get("TTS_COMPILE", "0") == "1"
+
+    # 合成结果 LRU 缓存条目数与总大小（MB），任一为 0 表示关闭
+    audio_cache_size = int(os.environ.get("TTS_AUDIO_CACHE", "128"))
+    audio_cache_max_bytes = int(float(os.environ.get("TTS_AUDIO_CACHE_MB", "64")) * 1024 * 1024)
+
     # ---------------------------------------------------------------
     # 加载自定义拼音词典（必须在 TTSEngine 初始化之前）
     # ---------------------------------------------------------------
@@ -820,9 +1609,14 @@ def main():
         languages=languages,
         device=device,
         clone_data_dir=voice_clone_dir,
+        bert_batch_wait_ms=bert_batch_wait_ms,
+        warmup=warmup,
+        compile_decoders=compile_decoders,
+        audio_cache_size=audio_cache_size,
+        audio_cache_max_bytes=audio_cache_max_bytes,
     )
 
-    app = make_app(engine)
+    app = make_app(engine, tts_workers=tts_workers, tmp_dir=tmp_dir)
 
     # ---------------------------------------------------------------
     # 监听
@@ -0,0 +1,120 @@
+import os
+import random
+
+import pytest
+
+from multipart_stream import MultipartStreamParser, parse_content_disposition
+
+
+BOUNDARY = b"----ticosBoundary7MA4YWxk"
+
+
+def _part(headers: str, body: bytes) -> bytes:
+    return b"--" + BOUNDARY + b"\r\n" + headers.encode("utf-8") + b"\r\n\r\n" + body + b"\r\n"
+
+
+def _body(parts, preamble=b"", epilogue=b""):
+    return preamble + b"".join(parts) + b"--" + BOUNDARY + b"--\r\n" + epilogue
+
+
+def _feed(body: bytes, chunk_sizes, tmp_path):
+    parser = MultipartStreamParser(BOUNDARY, tmp_dir=str(tmp_path))
+    pos = 0
+    while pos < len(body):
+        size = next(chunk_sizes)
+        parser.feed(body[pos:pos + size])
+        pos += size
+    parser.finish()
+    return parser
+
+
+def _random_sizes(rng):
+    while True:
+        yield rng.choice((1, 2, 3, rng.randint(1, 64), rng.randint(1, 70000)))
+
+
+def _tricky_payload(rng, size):
+    # 夹杂分隔符前缀（\r\n--<boundary 的前若干字节>），检验不会被误判为分段结束；
+    # 前缀后紧跟 boundary 中没有的字节，保证不会与后续随机字节凑成完整分隔符
+    pieces = []
+    while sum(map(len, pieces)) < size:
+        if rng.random() < 0.2:
+            prefix = (b"\r\n--" + BOUNDARY)[:rng.randint(1, len(BOUNDARY) + 3)]
+            pieces.append(prefix + b"\x00")
+        else:
+            pieces.append(bytes(rng.getrandbits(8) for _ in range(rng.randint(1, 512))))
+    return b"".join(pieces)[:size]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_file_and_fields_random_chunks(tmp_path, seed):
+    rng = random.Random(seed)
+    payload = _tricky_payload(rng, rng.randint(0, 200000))
+    body = _body(
+        [
+            _part('Content-Disposition: form-data; name="lang"', b"ZH"),
+            _part(
+                'Content-Disposition: form-data; name="ref_audio"; filename="a;b \\"c\\".wav"\r\n'
+                "Content-Type: audio/wav",
+                payload,
+            ),
+            _part('Content-Disposition: form-data; name="note"', "中文字段".encode("utf-8")),
+        ],
+        preamble=b"ignored preamble\r\n",
+        epilogue=b"ignored epilogue",
+    )
+    parser = _feed(body, _random_sizes(rng), tmp_path)
+    try:
+        assert parser.fields == {"lang": "ZH", "note": "中文字段"}
+        assert os.path.dirname(parser.file_path) == str(tmp_path)
+        with open(parser.file_path, "rb") as f:
+            assert f.read() == payload
+    finally:
+        os.unlink(parser.file_path)
+
+
+def test_ref_audio_as_plain_field(tmp_path):
+    body = _body([_part('Content-Disposition: form-data; name="ref_audio"', b"https://example.com/a.wav")])
+    parser = _feed(body, iter(lambda: 5, None), tmp_path)
+    assert parser.file_path is None
+    assert parser.fields == {"ref_audio": "https://example.com/a.wav"}
+    assert os.listdir(tmp_path) == []
+
+
+def test_missing_name_is_rejected(tmp_path):
+    body = _body([_part("Content-Disposition: form-data", b"x")])
+    with pytest.raises(ValueError):
+        _feed(body, iter(lambda: len(body), None), tmp_path)
+
+
+def test_bad_boundary_terminator_is_rejected(tmp_path):
+    body = b"--" + BOUNDARY + b"XX"
+    with pytest.raises(ValueError):
+        _feed(body, iter(lambda: 1, None), tmp_path)
+
+
+@pytest.mark.parametrize("cut", [-150, -len(BOUNDARY) - 8, -len(BOUNDARY) - 5, -4])
+def test_truncated_body_is_rejected(tmp_path, cut):
+    # 依次截断在：文件内容中、内容刚结束、结尾分隔符中、结尾 "--" 之前
+    body = _body([
+        _part('Content-Disposition: form-data; name="ref_audio"; filename="a.wav"', os.urandom(200)),
+    ])
+    parser = MultipartStreamParser(BOUNDARY, tmp_dir=str(tmp_path))
+    parser.feed(body[:cut])
+    assert not parser.complete
+    with pytest.raises(ValueError):
+        parser.finish()
+    # finish 后文件句柄已关闭，文件仍由调用方清理
+    assert parser._sink is None
+    os.unlink(parser.file_path)
+
+
+@pytest.mark.parametrize("value, expected", [
+    ('form-data; name="ref_audio"; filename="a.wav"', ("form-data", {"name": "ref_audio", "filename": "a.wav"})),
+    ('Form-Data; NAME=lang', ("form-data", {"name": "lang"})),
+    ('form-data; name="a;b"; filename="x \\"y\\".wav"', ("form-data", {"name": "a;b", "filename": 'x "y".wav'})),
+    ("form-data; name=\"f\"; filename*=UTF-8''%E9%9F%B3.wav", ("form-data", {"name": "f", "filename*": "UTF-8''%E9%9F%B3.wav"})),
+    ("", ("", {})),
+])
+def test_parse_content_disposition(value, expected):
+    assert parse_content_disposition(value) == expected
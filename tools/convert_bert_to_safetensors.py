@@ -0,0 +1,60 @@
+"""将本地 BERT 目录中的 pytorch_model.bin 转换为 model.safetensors（一次性离线执行）。
+
+transformers 在目录中同时存在两种格式时优先读取 model.safetensors，以 mmap 方式零拷贝加载，
+省去 pickle 反序列化，可明显缩短 RoBERTa-large 等模型的冷启动时间。
+
+用法:
+    python tools/convert_bert_to_safetensors.py /app/bert_models/hfl__chinese-roberta-wwm-ext-large [...]
+"""
+import argparse
+import os
+import sys
+
+import torch
+from safetensors.torch import save_file
+
+
+def convert(model_dir, overwrite=False):
+    src = os.path.join(model_dir, "pytorch_model.bin")
+    dst = os.path.join(model_dir, "model.safetensors")
+    if not os.path.isfile(src):
+        print(f"跳过 {model_dir}: 未找到 pytorch_model.bin")
+        return False
+    if os.path.isfile(dst) and not overwrite:
+        print(f"跳过 {model_dir}: model.safetensors 已存在")
+        return False
+
+    state_dict = torch.load(src, map_location="cpu")
+    # safetensors 不允许共享存储的张量：MLM decoder 与词嵌入绑定，只保留第一次出现的键，
+    # 加载时 transformers 会重新绑定权重
+    tensors = {}
+    seen = set()
+    for name, tensor in state_dict.items():
+        ptr = (tensor.untyped_storage().data_ptr(), tensor.storage_offset(), tuple(tensor.shape))
+        if ptr in seen:
+            print(f"  丢弃共享权重 {name}")
+            continue
+        seen.add(ptr)
+        tensors[name] = tensor.contiguous()
+
+    # transformers 校验 metadata 中的 format 字段
+    save_file(tensors, dst, metadata={"format": "pt"})
+    print(f"已生成 {dst}（{len(tensors)} 个张量）")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="将 BERT 权重转换为 safetensors 格式")
+    parser.add_argument("model_dirs", nargs="+", help="包含 config.json 与 pytorch_model.bin 的模型目录")
+    parser.add_argument("--overwrite", action="store_true", help="覆盖已存在的 model.safetensors")
+    args = parser.parse_args()
+
+    for model_dir in args.model_dirs:
+        if not os.path.isdir(model_dir):
+            print(f"错误: 目录不存在: {model_dir}")
+            sys.exit(1)
+        convert(model_dir, overwrite=args.overwrite)
+
+
+if __name__ == "__main__":
+    main()